@@ -0,0 +1,53 @@
+import argparse
+import sys
+
+from . import parity, runner, startup
+from .workloads import WORKLOADS
+
+# python -m benchmarks run [--engine E] [--warmup N] [--repeat N] [--only NAME ...] [--out FILE]
+# python -m benchmarks compare OLD.json NEW.json [--threshold 0.1]
+# python -m benchmarks startup [--engine E] [--repeat N] [--budget MS]
+# python -m benchmarks parity [--engine E]
+
+argparser = argparse.ArgumentParser(prog='python -m benchmarks')
+sub = argparser.add_subparsers(dest='command', required=True)
+
+run_p = sub.add_parser('run', help='run the workloads and report median/p95/peak memory')
+run_p.add_argument('--engine', choices=runner.ENGINES, default='eval')
+run_p.add_argument('--warmup', type=int, default=1)
+run_p.add_argument('--repeat', type=int, default=5)
+run_p.add_argument('--only', nargs='+', choices=[w.name for w in WORKLOADS], help='run just these workloads')
+run_p.add_argument('--out', help='write results as JSON to this file')
+
+cmp_p = sub.add_parser('compare', help='compare two result files and flag regressions')
+cmp_p.add_argument('old')
+cmp_p.add_argument('new')
+cmp_p.add_argument('--threshold', type=float, default=0.10, help='relative slowdown of the median that counts as a regression')
+
+start_p = sub.add_parser('startup', help='time a cold start of main.py and fail if its imports exceed a budget')
+start_p.add_argument('--engine', choices=runner.ENGINES, default='eval')
+start_p.add_argument('--repeat', type=int, default=5)
+start_p.add_argument('--budget', type=float, default=50, help='milliseconds the median cold start may spend importing')
+
+parity_p = sub.add_parser('parity', help="check an engine's results against eval on corner-case programs")
+parity_p.add_argument('--engine', choices=runner.ENGINES, default='vm')
+
+args = argparser.parse_args()
+sys.setrecursionlimit(100000)
+
+if args.command == 'run':
+    results = runner.run(args.only, args.engine, args.warmup, max(1, args.repeat))
+    if args.out: runner.save(results, args.out)
+
+elif args.command == 'startup':
+    if not startup.check(args.engine, max(1, args.repeat), args.budget): sys.exit(1)
+
+elif args.command == 'parity':
+    if not parity.check(args.engine): sys.exit(1)
+
+else:
+    lines, regressed = runner.compare(runner.load(args.old), runner.load(args.new), args.threshold)
+    for line in lines: print(line)
+    if regressed:
+        print(f'{len(regressed)} regression(s) above {args.threshold:.0%}: {", ".join(regressed)}')
+        sys.exit(1)
@@ -0,0 +1,60 @@
+import sys
+
+from src import session
+
+# Parity check: runs each program on eval_ and on another engine, each in a fresh session, and
+# compares the results' types and Inspect() output. eval_ is the reference; the programs are
+# corner cases where an engine's shortcuts are easy to get wrong: closures seeing lets that run
+# after them, lets read before they have run, builtins redefined after use, duplicate parameters,
+# errors kept as values, and returns out of an if used as a value.
+
+PROGRAMS = [
+    # closures see later lets of the names they capture
+    'let f = fn(u) { let a = 1; let g = fn(v) { a }; let a = 2; g(0) }; f(0)',
+    'let f = fn(n) { let helper = fn(k) { k + base }; let base = 100; helper(n) }; f(1)',
+    'let f = fn(n) { let ev = fn(k) { if (k == 0) { true } else { od(k - 1) } }; '
+    'let od = fn(k) { if (k == 0) { false } else { ev(k - 1) } }; ev(n) }; f(7)',
+    'let mk = fn(u) { let c = 0; let inc = fn(u) { c + 1 }; let c = 10; inc }; mk(0)(0)',
+    'let f = fn(a) { fn(b) { fn(c) { a + b + c } } }; f(1)(2)(3)',
+    'let f = fn(x) { let g = fn(u) { x }; let x = x + 1; g(0) }; f(1)',
+    'let f = fn(n) { if (n > 0) { f(n - 1) } else { 0 } }; let g = f; let f = fn(n) { 99 }; g(3)',
+    # a let read before it has run falls back on the enclosing bindings
+    'let x = 1; let f = fn(u) { let y = x; let x = 2; [y, x] }; f(0)',
+    'let a = 9; let f = fn(u) { let g = fn(u) { a }; let r = g(0); let a = 5; [r, g(0)] }; f(0)',
+    'let f = fn(u) { let g = fn(u) { a }; let r = g(0); let a = 5; [r, g(0)] }; f(0)',
+    'let f = fn(u) { let q = qq; q }; f(0)',
+    # builtins are looked up late, like globals
+    'let g = fn(x) { len(x) }; let a = g([1, 2, 3]); let len = fn(x) { 99 }; [a, g([1, 2, 3])]',
+    'let f = fn(u) { let r = len("ab"); let len = 1; [r, len] }; f(0)',
+    # the last of two same-named parameters wins
+    'fn(x, x) { x }(1, 2)',
+    # errors kept as values
+    '{"a": -true}',
+    '{-true: 1}',
+    'let f = fn(x) { let e = -true; 5 }; f(1)',
+    'let f = fn(x) { let e = -true; e }; f(1)',
+    # a return inside an if used as a value
+    'let g = fn(x) { 7 }; let f = fn(c) { let y = if (c) { return g(0); }; 1 }; f(true)',
+    'let g = fn(x) { 7 }; let f = fn(c) { let y = if (c) { return g(0); }; y; 1 }; f(true)',
+    'let f = fn(c) { let y = if (c) { if (c) { return 5 }; 6 } else { 2 }; [y] }; f(true)',
+    'let f = fn(u) { 1 + if (true) { return 2 } else { 3 } }; f(0)',
+    'let f = fn(u) { return if (true) { return 1 } else { 2 } }; f(0)',
+    'let y = if (true) { return 3; }; y; 4',
+]
+
+
+def run(engine: str, source: str) -> tuple[str, str]:
+    program, errors = session.parse(source)
+    if errors: raise ValueError(f'parse errors in {source!r}: {errors}')
+    res = session.Session(engine).run(program)
+    return res.Type(), res.Inspect()
+
+def check(engine: str, log=sys.stderr) -> bool:
+    diffs = 0
+    for source in PROGRAMS:
+        want, got = run('eval', source), run(engine, source)
+        if want != got:
+            diffs += 1
+            print(f'{source}\n    eval: {want[0]} {want[1]}\n    {engine}: {got[0]} {got[1]}', file=log)
+    print(f'parity ({engine}): {len(PROGRAMS) - diffs} of {len(PROGRAMS)} programs match eval', file=log)
+    return diffs == 0
@@ -0,0 +1,113 @@
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from src import session
+
+from .workloads import WORKLOADS, Workload
+
+# Runs workloads with warmup and repetitions and summarizes the timings; compares result files.
+#
+# Timed repetitions run without tracemalloc; peak memory is taken from one extra, traced
+# iteration, so tracing overhead never shows up in the timings.
+
+ENGINES = session.ENGINES
+
+
+def percentile(values: list[float], p: float) -> float:
+    # nearest-rank, so with few repetitions p95 is simply the slowest run
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(-(-p * len(ordered) // 100)) - 1))
+    return ordered[k]
+
+def run_workload(w: Workload, engine: str, warmup: int, repeat: int) -> dict:
+    iteration = w.prepare(engine)
+    for _ in range(warmup): iteration()
+
+    times = []
+    units = 0
+    for _ in range(repeat):
+        gc.collect()
+        t = time.perf_counter()
+        units = iteration()
+        times.append(time.perf_counter() - t)
+
+    gc.collect()
+    tracemalloc.start()
+    iteration()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median = statistics.median(times)
+    return {
+        'unit': w.unit,
+        'units': units,
+        'repeat': repeat,
+        'times': times,
+        'median': median,
+        'p95': percentile(times, 95),
+        'min': min(times),
+        'throughput': units / median if median > 0 else None,
+        'peak_bytes': peak,
+    }
+
+def run(names: list[str] | None, engine: str, warmup: int, repeat: int, log=sys.stderr) -> dict:
+    results = {}
+    for w in WORKLOADS:
+        if names and w.name not in names: continue
+        results[w.name] = r = run_workload(w, engine, warmup, repeat)
+        print(format_result(w.name, r), file=log)
+    return {
+        'meta': {
+            'engine': engine,
+            'warmup': warmup,
+            'repeat': repeat,
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'results': results,
+    }
+
+def format_result(name: str, r: dict) -> str:
+    rate = f'{r["throughput"]:>12,.0f} {r["unit"]}/s' if r['throughput'] is not None else ''
+    return f'{name:<14} median {r["median"] * 1000:9.2f} ms  p95 {r["p95"] * 1000:9.2f} ms  peak {r["peak_bytes"] / 1024:9.0f} KiB  {rate}'
+
+
+# ===
+# Comparison
+# ===
+
+def compare(old: dict, new: dict, threshold: float) -> tuple[list[str], list[str]]:
+    # returns (report lines, names of regressed workloads); a workload regresses when its median
+    # time grows by more than threshold (0.1 = 10%)
+    lines = []
+    regressed = []
+    if old['meta'].get('engine') != new['meta'].get('engine'):
+        lines.append(f'warning: comparing engine {old["meta"].get("engine")} against {new["meta"].get("engine")}')
+    for name, n in new['results'].items():
+        o = old['results'].get(name, None)
+        if o is None:
+            lines.append(f'{name:<14} new workload')
+            continue
+        change = n['median'] / o['median'] - 1 if o['median'] > 0 else 0.0
+        mem = n['peak_bytes'] / o['peak_bytes'] - 1 if o['peak_bytes'] > 0 else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressed.append(name)
+        lines.append(f'{name:<14} {o["median"] * 1000:9.2f} ms -> {n["median"] * 1000:9.2f} ms  {change:+7.1%}  peak {mem:+7.1%}{flag}')
+    for name in old['results']:
+        if name not in new['results']: lines.append(f'{name:<14} missing from new results')
+    return lines, regressed
+
+def load(path: str) -> dict:
+    with open(path) as f: return json.load(f)
+
+def save(results: dict, path: str) -> None:
+    with open(path, 'w') as f: json.dump(results, f, indent=2)
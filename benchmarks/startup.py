@@ -0,0 +1,61 @@
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Cold-start check: runs main.py on a one-line script in a fresh interpreter, with -X importtime,
+# and reports how long imports took (the cumulative time of every top-level import) and the
+# whole process's wall time. The interpreter runs with -S, so site-packages is not on the path:
+# the startup path is meant to need nothing beyond the standard library, and importing anything
+# else fails the run. One untimed run first leaves compiled bytecode behind, as an installed
+# interpreter would have it, so the timings are not of compiling the sources.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = 'puts(1 + 2);\n'
+
+
+def parse_importtime(stderr: str) -> tuple[float, int]:
+    # lines look like 'import time:  self [us] | cumulative | package', nested imports indented
+    total_us = 0
+    modules = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or line.endswith('| imported package'): continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules += 1
+        if not name[1:].startswith(' '): total_us += int(cumulative)
+    return total_us / 1000, modules
+
+def measure(engine: str, repeat: int) -> dict:
+    with tempfile.NamedTemporaryFile('w', suffix='.mk', delete=False) as f: f.write(SCRIPT)
+    try:
+        command = [sys.executable, '-S', '-X', 'importtime', 'main.py', '--no-cache', f'--engine={engine}', f.name]
+        env = {k: v for k, v in os.environ.items() if k != 'PYTHONDONTWRITEBYTECODE'}
+        imports, walls, modules = [], [], 0
+        for i in range(repeat + 1):
+            t = time.perf_counter()
+            proc = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+            wall = time.perf_counter() - t
+            ms, modules = parse_importtime(proc.stderr)
+            if proc.returncode != 0:
+                failure = [line for line in proc.stderr.splitlines() if not line.startswith('import time:')]
+                return {'failed': '\n'.join(failure)}
+            if i > 0:
+                imports.append(ms)
+                walls.append(wall)
+    finally:
+        os.remove(f.name)
+    return {'import_ms': statistics.median(imports), 'wall_ms': 1000 * statistics.median(walls), 'modules': modules}
+
+def check(engine: str, repeat: int, budget_ms: float, log=sys.stderr) -> bool:
+    r = measure(engine, repeat)
+    if 'failed' in r:
+        print(f'startup ({engine}): main.py failed without site-packages:\n{r["failed"]}', file=log)
+        return False
+    print(f'startup ({engine}): imports {r["import_ms"]:.1f} ms median, wall {r["wall_ms"]:.1f} ms median, '
+          f'{r["modules"]} modules, budget {budget_ms:.0f} ms', file=log)
+    if r['import_ms'] > budget_ms:
+        print(f'imports took {r["import_ms"]:.1f} ms, over the {budget_ms:.0f} ms budget', file=log)
+        return False
+    return True
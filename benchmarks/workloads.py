@@ -0,0 +1,129 @@
+from typing import Callable
+
+from src import ast, lexer, token, object_, session
+
+# A workload is prepared once (sources generated and parsed outside the timed region) and then
+# returns a callable doing one timed iteration. The callable returns how many units it processed,
+# so results can be reported as throughput as well as time.
+
+
+class Workload:
+    def __init__(self, name: str, unit: str, prepare: Callable[[str], Callable[[], int]]):
+        self.name = name
+        self.unit = unit
+        self.prepare = prepare  # engine -> one iteration
+
+
+def parse(src: str) -> ast.Program:
+    program, errors = session.parse(src)
+    if errors: raise ValueError(f'benchmark source does not parse: {errors[0]}')
+    return program
+
+def run_program(engine: str, program: ast.Program) -> object_.Object:
+    # a fresh session per iteration; the program is parsed once, outside the timed region
+    return session.Session(engine).run(program)
+
+def count_nodes(node: ast.Node | None) -> int:
+    if node is None: return 0
+    return 1 + sum([count_nodes(child) for child in ast.children(node)])
+
+
+# ===
+# Sources
+# ===
+
+LEXER_SOURCE = '\n'.join([
+    f'let add{"abcdefghij"[i % 10]} = fn(x, y) {{ if (x < {i}) {{ return x + y * {i}; }} else {{ return "s{i}"; }} }};\n'
+    f'let arr = [1, 2, {i}, "foo", add(3, 2)]; let h = {{"k": {i}, true: false}}; h["k"] != arr[2] == !true;'
+    for i in range(400)
+])
+
+FIB = 'let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(16)'
+
+FACTORIAL = '''
+let factorial = fn(n) { if (n == 0) { 1 } else { n * factorial(n - 1) } };
+let loop = fn(i) { if (i == 0) { 0 } else { factorial(40); loop(i - 1) } };
+loop(100)
+'''
+
+LIST = '''
+let map = fn(arr, func) {
+    let iter = fn(arr, newarr) {
+        if (len(arr) == 0) { return newarr; } else { return iter(rest(arr), push(newarr, func(first(arr)))); }
+    };
+    return iter(arr, []);
+};
+let build = fn(n, acc) { if (n == 0) { acc } else { build(n - 1, push(acc, n)) } };
+let double = fn(x) { x * 2 };
+len(map(map(build(500, []), double), double))
+'''
+
+HASH = '''
+let lookup = fn(i, acc) {
+    if (i == 0) { acc } else {
+        let h = {"a": i, "b": i + 1, "c": i + 2, 1: "one", true: "yes"};
+        lookup(i - 1, acc + h["a"] + h["c"])
+    }
+};
+lookup(500, 0)
+'''
+
+STRINGS = '''
+let concat = fn(i, s) { if (i == 0) { s } else { concat(i - 1, s + "abc") } };
+len(concat(1000, ""))
+'''
+
+INTS = '''
+let a = range(100000);
+let b = a * a + a;
+sum(b) + max(b) - min(slice(b, 10, 1000))
+'''
+
+
+# ===
+# Workloads
+# ===
+
+def prepare_lexer(engine: str) -> Callable[[], int]:
+    def iteration():
+        l = lexer.Lexer(inp=LEXER_SOURCE)
+        lexer.read_char(l)
+        n = 1
+        while lexer.next_token(l).type_ != token.EOF: n += 1
+        return n
+    return iteration
+
+def prepare_scanner(engine: str) -> Callable[[], int]:
+    def iteration(): return sum(1 for _ in lexer.tokenize(LEXER_SOURCE))
+    return iteration
+
+def prepare_parser(engine: str) -> Callable[[], int]:
+    nodes = count_nodes(parse(LEXER_SOURCE))
+    def iteration():
+        parse(LEXER_SOURCE)
+        return nodes
+    return iteration
+
+def program_workload(src: str, expect: str) -> Callable[[str], Callable[[], int]]:
+    def prepare(engine: str) -> Callable[[], int]:
+        program = parse(src)
+        res = run_program(engine, program).Inspect()
+        if res != expect: raise ValueError(f'{engine} computed {res}, expected {expect}')
+        def iteration():
+            run_program(engine, program)
+            return 1
+        return iteration
+    return prepare
+
+
+WORKLOADS = [
+    Workload('lexer', 'tokens', prepare_lexer),
+    Workload('lexer-scanner', 'tokens', prepare_scanner),
+    Workload('parser', 'nodes', prepare_parser),
+    Workload('fib', 'runs', program_workload(FIB, '987')),
+    Workload('factorial', 'runs', program_workload(FACTORIAL, '0')),
+    Workload('list', 'runs', program_workload(LIST, '500')),
+    Workload('hash', 'runs', program_workload(HASH, str(sum(2 * i + 2 for i in range(1, 501))))),
+    Workload('strings', 'runs', program_workload(STRINGS, '3000')),
+    Workload('ints', 'runs', program_workload(INTS, str(sum(i * i + i for i in range(100000)) + 99999 * 99999 + 99999 - 110))),
+]
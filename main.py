@@ -1,34 +1,160 @@
 import argparse
+import sys
 
-from src import token, lexer, parser, evaluator, object_
+from src import ast, token, lexer, parser, object_, session
 
-argparser = argparse.ArgumentParser()
-argparser.add_argument('--repl', action='store_true')
-argparser.add_argument('--lexer', action='store_true')
-argparser.add_argument('--parser', action='store_true')
-args = argparser.parse_args()
+# Only what every run needs is imported up front (no third-party packages at all); the parse
+# cache, the batch runner, budgets, the jit, memoization, the profiler, the optimizer, snapshots,
+# json and each engine's modules are loaded by the runs that use them, so that a one-line script
+# starts quickly. python -m benchmarks startup keeps an eye on that.
+
+def new_argparser() -> argparse.ArgumentParser:
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('file', nargs='?', help='monkey source file to run')
+    argparser.add_argument('--repl', action='store_true')
+    argparser.add_argument('--lexer', action='store_true')
+    argparser.add_argument('--parser', action='store_true')
+    argparser.add_argument('--engine', choices=session.ENGINES, default='eval')
+    argparser.add_argument('--jit', action='store_true', help='translate hot functions to python (eval engine)')
+    argparser.add_argument('--memo', action='store_true', help='memoize pure functions (eval engine); report on stderr')
+    argparser.add_argument('--memo-size', type=int, help='entries kept per memoized function (default 1024)')
+    argparser.add_argument('--profile', action='store_true', help='per-function calls/time/allocations (eval engine); table on stderr')
+    argparser.add_argument('--profile-stacks', metavar='FILE', help='with --profile, also write collapsed stacks for flamegraph tools')
+    argparser.add_argument('--scanner', action='store_true', help='tokenize with the regex-driven lexer.Scanner')
+    argparser.add_argument('--optimize', action='store_true', help='fold constants and prune dead code before running; report on stderr')
+    argparser.add_argument('--cache-dir', help='where parsed programs are cached when running a file (default ~/.cache/monkey)')
+    argparser.add_argument('--no-cache', action='store_true', help='always parse the file from source')
+    argparser.add_argument('--cache-stats', action='store_true', help='report cache hits/misses on stderr')
+    argparser.add_argument('--batch', metavar='DIR|MANIFEST', help='run every script in DIR, or listed in MANIFEST, across a process pool; JSON lines on stdout')
+    argparser.add_argument('--workers', type=int, default=None, help='--batch pool size (default: one per core)')
+    argparser.add_argument('--chunksize', type=int, default=16, help='scripts per --batch task')
+    argparser.add_argument('--order', choices=['submission', 'completion'], default='submission', help='--batch output order')
+    argparser.add_argument('--max-steps', type=int, help='stop with an error after evaluating this many nodes (eval engine)')
+    argparser.add_argument('--max-depth', type=int, help='stop with an error beyond this many nested calls (eval engine)')
+    argparser.add_argument('--max-bytes', type=int, help='stop with an error after allocating about this many bytes of strings/arrays/hashes (eval engine)')
+    argparser.add_argument('--restore', metavar='FILE', help='start from a session snapshot written by :save in the repl')
+    argparser.add_argument('--count-allocs', action='store_true', help='report object allocations per program on stderr')
+    return argparser
+
+# ===
+# Engines
+# ===
+
+def new_parser(inp: str) -> parser.Parser:
+    return session.new_parser(inp, args.scanner)
+
+def compile_source(inp: str) -> tuple[ast.Program, list[str]]:
+    # parse, and optimize when asked to; this is what the file cache stores
+    p = new_parser(inp)
+    program = p.parse_program()
+    if not p.errors and args.optimize:
+        from src import optimizer
+        print(optimizer.optimize(program), file=sys.stderr)
+    return program, p.errors
+
+class Session(session.Session):
+    def execute(self, program) -> object_.Object:
+        # run() plus whatever the command line asked for around it
+        if args.profile:
+            from src import profiler
+            with profiler.profiling(): return self.counted(program)
+        return self.counted(program)
+
+    def counted(self, program) -> object_.Object:
+        if not args.count_allocs: return self.run(program)
+        with object_.count_allocations() as counts:
+            res = self.run(program)
+        total = sum(counts.values())
+        detail = ', '.join([f'{name}={n}' for name, n in counts.most_common()])
+        print(f'allocations: {total}' + (f' ({detail})' if detail else ''), file=sys.stderr)
+        return res
+
+def repl_command(sess: Session, line: str) -> None:
+    # :save FILE and :load FILE snapshot the session's top-level state and bring it back
+    from src import snapshot
+    command, _, path = line.partition(' ')
+    path = path.strip()
+    if command not in (':save', ':load') or not path:
+        print('commands: :save FILE, :load FILE')
+        return
+    try:
+        if command == ':save': snapshot.save(sess, path)
+        else: snapshot.load(sess, path)
+    except snapshot.SnapshotError as e:
+        print(e)
+
+def new_session() -> Session:
+    sess = Session(args.engine, limits)
+    if args.restore:
+        from src import snapshot
+        try:
+            snapshot.load(sess, args.restore)
+        except snapshot.SnapshotError as e:
+            argparser.error(str(e))
+    return sess
 
 # ===
 # Test Lexer
 # ===
 
 if __name__ == '__main__':
+    argparser = new_argparser()
+    args = argparser.parse_args()
+
+    limits = None
+    if args.max_steps is not None or args.max_depth is not None or args.max_bytes is not None:
+        if args.engine != 'eval': argparser.error('--max-steps/--max-depth/--max-bytes need --engine=eval')
+        from src import budget
+        try:
+            limits = budget.Budget(args.max_steps, args.max_depth, args.max_bytes)
+        except ValueError as e:
+            argparser.error(str(e))
 
+    if args.jit:
+        from src import jit
+        jit.enabled = True
+    if args.memo:
+        from src import memo
+        memo.enabled = True
+        if args.memo_size is not None: memo.MAX_ENTRIES = args.memo_size
 
-    if args.repl:
-        env = object_.Environment()
+    if args.batch:
+        import json
+        from src import batch
+        for res in batch.run(batch.collect(args.batch), args.engine, args.workers, args.chunksize, args.order, limits):
+            print(json.dumps(res), flush=True)
+
+    elif args.repl:
+        sess = new_session()
         while True:
             inp = input('>>> ')
-            l = lexer.Lexer(inp=inp)
-            lexer.read_char(l)
-            p = parser.Parser(l=l)
-            program = p.parse_program()
-            if len(p.errors) > 0:
-                for err in p.errors: print(err)
+            if inp.startswith(':'):
+                repl_command(sess, inp)
+                continue
+            program, errors = compile_source(inp)
+            if len(errors) > 0:
+                for err in errors: print(err)
             else:
-                evaluated = evaluator.eval_(program, env)
+                evaluated = sess.execute(program)
                 if evaluated.Type() != object_.NULL_OBJ: print(evaluated.Inspect())
 
+    elif args.file is not None and args.lexer:
+        # tokens are streamed from the file, so arbitrarily large inputs can be dumped
+        for tok in lexer.stream_file(args.file): print(tok)
+
+    elif args.file is not None:
+        with open(args.file) as f: source = f.read()
+        if args.no_cache: program, errors = compile_source(source)
+        else:
+            from src import cache
+            program, errors = cache.load(args.cache_dir or cache.DEFAULT_DIR, source, compile_source, tag='optimized' if args.optimize else '')
+            if args.cache_stats: print(cache.report(), file=sys.stderr)
+        if len(errors) > 0:
+            for err in errors: print(err)
+            exit(1)
+        evaluated = new_session().execute(program)
+        if evaluated.Type() != object_.NULL_OBJ: print(evaluated.Inspect())
+
     elif args.lexer:
         inp = """let five = 5;
 let ten = 10;
@@ -76,11 +202,13 @@ let myHash = {"name": "Jimmy", "age": 72, "band": "Led Zeppelin"};
 myHash["name"]
 """.strip()
 
-        l = lexer.Lexer(inp=inp)
-        lexer.read_char(l)
+        if args.scanner: l = lexer.Scanner(inp)
+        else:
+            l = lexer.Lexer(inp=inp)
+            lexer.read_char(l)
         cnt = 0
         while True:
-            tok = lexer.next_token(l)
+            tok = l.next_token() if args.scanner else lexer.next_token(l)
             print(tok)
             if tok.type_ == token.EOF:
                 break
@@ -131,9 +259,7 @@ myarr[4]
 let myHash = {"name": "Jimmy", "age": 72, "band": "Led Zeppelin"};
 myHash["name"]
 '''.strip()
-        l = lexer.Lexer(inp=inp)
-        lexer.read_char(l)
-        p = parser.Parser(l=l)
+        p = new_parser(inp)
         program = p.parse_program()
         if len(p.errors) > 0:
             for err in p.errors: print(err)
@@ -224,16 +350,21 @@ map(arr, double);
         ]
 
         for i in inp:
-            env = object_.Environment()
-            l = lexer.Lexer(inp=i)
-            lexer.read_char(l)
-            p = parser.Parser(l=l)
-            program = p.parse_program()
-            if len(p.errors) > 0:
-                for err in p.errors: print(err)
+            sess = Session(args.engine, limits)
+            program, errors = compile_source(i)
+            if len(errors) > 0:
+                for err in errors: print(err)
                 exit(0)
             # format input for printing
             print('\n>>>', '\n>>> '.join(i.split('\n')))
-            ans = evaluator.eval_(program, env)
+            ans = sess.execute(program)
             print(ans.Type(),ans.Inspect())
 
+
+    if args.jit: print(jit.report(), file=sys.stderr)
+    if args.memo: print(memo.report(), file=sys.stderr)
+    if args.profile:
+        from src import profiler
+        print(profiler.report(), file=sys.stderr)
+        if args.profile_stacks:
+            with open(args.profile_stacks, 'w') as f: f.write(profiler.collapsed() + '\n')
@@ -1,26 +1,39 @@
 from abc import abstractmethod, ABC
-from pydantic import BaseModel
 from . import token
 
+# Nodes are plain slotted classes: the parser builds one per token or so, and neither
+# per-field validation nor a per-instance __dict__ pays for itself here.
+
 
 class Node(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def token_literal(self) -> str: pass
 
+    def __reduce__(self):
+        # pickle as a constructor call over the parsed fields; the generic slots protocol is
+        # several times slower, and annotations left by later passes are recomputed anyway
+        cls = self.__class__
+        code = cls.__init__.__code__
+        return cls, tuple([getattr(self, name) for name in code.co_varnames[1:code.co_argcount]])
+
 class Statement(Node, ABC):
+    __slots__ = ()
     def statement_node(self) -> None: pass
 
 class Expression(Node, ABC):
+    __slots__ = ()
     def expression_node(self) -> None: pass
 
 # ===
 
-class Program(Node, BaseModel):
-    Statements: list[Statement]
+class Program(Node):
+    __slots__ = ('Statements',)
+
+    def __init__(self, Statements: list[Statement]):
+        self.Statements = Statements
 
-    class Config:
-        arbitrary_types_allowed = True
-    
     def token_literal(self):
         if len(self.Statements) > 0: return self.Statements[0].token_literal()
         return ""
@@ -29,65 +42,73 @@ class Program(Node, BaseModel):
         return '\n'.join([str(s) for s in self.Statements])
 
 
-class Identifier(Expression, BaseModel):
-    Token: token.Token  # IDENT Token
-    Value: str
+class Identifier(Expression):
+    __slots__ = ('Token', 'Value', 'Resolved', 'Cache')
 
-    class Config:
-        arbitrary_types_allowed = True
+    def __init__(self, Token: token.Token, Value: str):
+        self.Token = Token  # IDENT Token
+        self.Value = Value
+        self.Resolved = None  # (depth, slot) candidates, innermost first; set by resolver
+        self.Cache = None  # (globals, version seen, version cell, value) of the last global/builtin lookup
 
     def token_literal(self) -> str: return self.Token.literal
 
     def __str__(self):
         return self.Value
 
-class IntegerLiteral(Expression, BaseModel):
-    Token: token.Token  # INT Token
-    Value: int
+class IntegerLiteral(Expression):
+    __slots__ = ('Token', 'Value')
 
-    class Config:
-        arbitrary_types_allowed = True
+    def __init__(self, Token: token.Token, Value: int):
+        self.Token = Token  # INT Token
+        self.Value = Value
 
     def token_literal(self) -> str: return self.Token.literal
 
     def __str__(self):
         return str(self.Value)
 
-class Boolean(Expression, BaseModel):
-    Token: token.Token
-    Value: bool
+class Boolean(Expression):
+    __slots__ = ('Token', 'Value')
+
+    def __init__(self, Token: token.Token, Value: bool):
+        self.Token = Token
+        self.Value = Value
 
-    class Config: arbitrary_types_allowed=True
     def token_literal(self) -> str: return self.Token.literal
     def __str__(self): return str(self.Token.literal)
 
 
-class PrefixExpression(Expression, BaseModel):
-    Token: token.Token
-    Operator: str
-    Right: Expression | None = None
+class PrefixExpression(Expression):
+    __slots__ = ('Token', 'Operator', 'Right')
+
+    def __init__(self, Token: token.Token, Operator: str, Right: Expression | None = None):
+        self.Token = Token
+        self.Operator = Operator
+        self.Right = Right
 
-    class Config: arbitrary_types_allowed = True
     def token_literal(self) -> str: return self.Token.literal
     def __str__(self): return f'({self.Operator}{self.Right})'
 
-class InfixExpression(Expression, BaseModel):
-    Token: token.Token  # could PLUS, MINUS, ASTERISK ...
-    Operator: str
-    Left: Expression | None = None
-    Right: Expression | None = None
+class InfixExpression(Expression):
+    __slots__ = ('Token', 'Operator', 'Left', 'Right')
+
+    def __init__(self, Token: token.Token, Operator: str, Left: Expression | None = None, Right: Expression | None = None):
+        self.Token = Token  # could PLUS, MINUS, ASTERISK ...
+        self.Operator = Operator
+        self.Left = Left
+        self.Right = Right
 
-    class Config: arbitrary_types_allowed = True
     def token_literal(self) -> str: return self.Token.literal
     def __str__(self): return f'({self.Left} {self.Operator} {self.Right})'
 
-class LetStatement(Statement, BaseModel):
-    Token: token.Token  # LET Token
-    Name: Identifier
-    Value: Expression | None = None  # TODO: for the timebeing, will remove this soon
+class LetStatement(Statement):
+    __slots__ = ('Token', 'Name', 'Value')
 
-    class Config:
-        arbitrary_types_allowed = True
+    def __init__(self, Token: token.Token, Name: Identifier, Value: Expression | None = None):
+        self.Token = Token  # LET Token
+        self.Name = Name
+        self.Value = Value  # TODO: for the timebeing, will remove this soon
 
     def token_literal(self) -> str: return self.Token.literal
 
@@ -95,46 +116,51 @@ class LetStatement(Statement, BaseModel):
         return f"{self.Token.literal} {self.Name} = {self.Value if self.Value is not None else ''};"
 
 
-class ReturnStatement(Statement, BaseModel):
-    Token: token.Token  # RETURN Token
-    Value: Expression | None = None  # TODO: will not be none in the future
+class ReturnStatement(Statement):
+    __slots__ = ('Token', 'Value', 'Tail')
 
-    class Config:
-        arbitrary_types_allowed = True
+    def __init__(self, Token: token.Token, Value: Expression | None = None):
+        self.Token = Token  # RETURN Token
+        self.Value = Value  # TODO: will not be none in the future
+        self.Tail = False  # set by unwind.mark_tail_returns
 
     def token_literal(self) -> str: return self.Token.literal
 
     def __str__(self):
         return f"{self.Token.literal} {self.Value if self.Value is not None else ''};"
 
-class ExpressionStatement(Statement, BaseModel):
-    Token: token.Token  # what will this token be?
-    Expression_: Expression | None = None
+class ExpressionStatement(Statement):
+    __slots__ = ('Token', 'Expression_')
 
-    class Config:
-        arbitrary_types_allowed = True
+    def __init__(self, Token: token.Token, Expression_: Expression | None = None):
+        self.Token = Token  # what will this token be?
+        self.Expression_ = Expression_
 
     def token_literal(self) -> str: return self.Token.literal
 
     def __str__(self):
         return str(self.Expression_) if self.Expression_ is not None else ''
 
-class BlockStatement(Statement, BaseModel):
-    Token: token.Token
-    Statements: list[Statement]
+class BlockStatement(Statement):
+    __slots__ = ('Token', 'Statements')
+
+    def __init__(self, Token: token.Token, Statements: list[Statement]):
+        self.Token = Token
+        self.Statements = Statements
 
-    class Config: arbitrary_types_allowed = True
     def token_literal(self) -> str: return self.Token.literal
     def __str__(self): return '\n'.join([str(x) for x in self.Statements])
 
 
-class IFExpression(Expression, BaseModel):
-    Token: token.Token
-    Condition: Expression
-    Consequence: BlockStatement
-    Alternative: BlockStatement | None = None
+class IFExpression(Expression):
+    __slots__ = ('Token', 'Condition', 'Consequence', 'Alternative')
+
+    def __init__(self, Token: token.Token, Condition: Expression, Consequence: BlockStatement, Alternative: BlockStatement | None = None):
+        self.Token = Token
+        self.Condition = Condition
+        self.Consequence = Consequence
+        self.Alternative = Alternative
 
-    class Config: arbitrary_types_allowed = True
     def token_literal(self) -> str: return self.Token.literal
     def __str__(self) -> str:
         ret = f"IF {self.Condition} {self.Consequence}"
@@ -143,52 +169,87 @@ class IFExpression(Expression, BaseModel):
         return ret
 
 
-class FunctionLiteral(Expression, BaseModel):
-    Token: token.Token
-    Parameters: list[Identifier];
-    Body: BlockStatement
+class FunctionLiteral(Expression):
+    __slots__ = ('Token', 'Parameters', 'Body', 'Scope')
+
+    def __init__(self, Token: token.Token, Parameters: list[Identifier], Body: BlockStatement):
+        self.Token = Token
+        self.Parameters = Parameters
+        self.Body = Body
+        self.Scope = None  # frame layout; set by resolver
 
-    class Config: arbitrary_types_allowed = True
     def token_literal(self) -> str: return self.Token.literal
     def __str__(self):
         return f"FN ({', '.join([str(x) for x in self.Parameters])}) {self.Body}"
 
 
-class CallExpression(Expression, BaseModel):
-    Token: token.Token
-    Function: Expression
-    Arguments: list[Expression]
+class CallExpression(Expression):
+    __slots__ = ('Token', 'Function', 'Arguments', 'Tail')
+
+    def __init__(self, Token: token.Token, Function: Expression, Arguments: list[Expression]):
+        self.Token = Token
+        self.Function = Function
+        self.Arguments = Arguments
+        self.Tail = False  # set by evaluator.mark_tail_calls
 
-    class Config: arbitrary_types_allowed = True
     def token_literal(self) -> str: return self.Token.literal
     def __str__(self): return f"{self.Function} ({', '.join([str(x) for x in self.Arguments])})"
 
-class StringLiteral(Expression, BaseModel):
-    Token: token.Token
-    Value: str
-    class Config: arbitrary_types_allowed = True
+class StringLiteral(Expression):
+    __slots__ = ('Token', 'Value')
+
+    def __init__(self, Token: token.Token, Value: str):
+        self.Token = Token
+        self.Value = Value
+
     def token_literal(self) -> str: return self.Token.literal
     def __str__(self): return '"'+self.Value+'"'
 
 
-class ArrayLiteral(Expression, BaseModel):
-    Token: token.Token
-    Elements: list[Expression]
-    class Config: arbitrary_types_allowed = True
+class ArrayLiteral(Expression):
+    __slots__ = ('Token', 'Elements')
+
+    def __init__(self, Token: token.Token, Elements: list[Expression]):
+        self.Token = Token
+        self.Elements = Elements
+
     def token_literal(self) -> str: return self.Token.literal
     def __str__(self): return f"[{', '.join([str(x) for x in self.Elements])}]"
 
-class IndexExpression(Expression, BaseModel):
-    Token: token.Token
-    Left: Expression
-    Right: Expression
-    class Config: arbitrary_types_allowed = True
+class IndexExpression(Expression):
+    __slots__ = ('Token', 'Left', 'Right')
+
+    def __init__(self, Token: token.Token, Left: Expression, Right: Expression):
+        self.Token = Token
+        self.Left = Left
+        self.Right = Right
+
     def token_literal(self) -> str: return self.Token.literal
     def __str__(self): return f"{self.Left}[{self.Right}]"
 
-class HashLiteral(Expression, BaseModel):
-    Token: token.Token
-    Elements: list[tuple[Expression, Expression]]
-    class Config: arbitrary_types_allowed = True
+class HashLiteral(Expression):
+    __slots__ = ('Token', 'Elements')
+
+    def __init__(self, Token: token.Token, Elements: list[tuple[Expression, Expression]]):
+        self.Token = Token
+        self.Elements = Elements
+
     def token_literal(self) -> str: return self.Token.literal
     def __str__(self): return '{' + ', '.join([f'{x}: {y}' for x, y in self.Elements]) + ' }'
+
+
+# ===
+
+def children(node: Node) -> list[Node | None]:
+    # direct sub-nodes, in evaluation order
+    if isinstance(node, (Program, BlockStatement)): return node.Statements
+    if isinstance(node, ExpressionStatement): return [node.Expression_]
+    if isinstance(node, (LetStatement, ReturnStatement)): return [node.Value]
+    if isinstance(node, PrefixExpression): return [node.Right]
+    if isinstance(node, (InfixExpression, IndexExpression)): return [node.Left, node.Right]
+    if isinstance(node, IFExpression): return [node.Condition, node.Consequence, node.Alternative]
+    if isinstance(node, FunctionLiteral): return [node.Body]
+    if isinstance(node, CallExpression): return [node.Function, *node.Arguments]
+    if isinstance(node, ArrayLiteral): return node.Elements
+    if isinstance(node, HashLiteral): return [x for pair in node.Elements for x in pair]
+    return []
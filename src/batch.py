@@ -0,0 +1,73 @@
+import contextlib
+import io
+import os
+import sys
+import time
+import traceback
+from typing import Iterator
+
+from . import budget as budget_, session
+
+# Runs many independent scripts across a process pool. Scripts are dispatched in chunks (one
+# task per chunk, to amortize the pickling round trip), each script runs in a fresh Session and
+# so a fresh Environment, and results come back as plain dicts, either in submission order or
+# as chunks complete. What a script prints is captured into its result's "stdout", so the
+# results are all that reaches the real stdout. concurrent.futures (and with it multiprocessing) is imported by run(), so
+# that importing this module for its constants costs a CLI run nothing.
+
+SUBMISSION = 'submission'
+COMPLETION = 'completion'
+
+
+def collect(target: str) -> list[str]:
+    # a directory (its regular, non-hidden files, sorted) or a manifest (one path per line,
+    # relative to the manifest; blank lines and #-comments skipped)
+    if os.path.isdir(target):
+        names = sorted([n for n in os.listdir(target) if not n.startswith('.')])
+        return [p for p in [os.path.join(target, n) for n in names] if os.path.isfile(p)]
+    base = os.path.dirname(target)
+    with open(target) as f:
+        lines = [line.strip() for line in f]
+    return [os.path.join(base, line) for line in lines if line and not line.startswith('#')]
+
+def run_script(index: int, path: str, engine: str, budget: budget_.Budget | None = None) -> dict:
+    res = {'index': index, 'path': path, 'type': None, 'inspect': None, 'errors': [], 'stdout': '', 'seconds': None}
+    t = time.perf_counter()
+    out = io.StringIO()
+    try:
+        with open(path) as f: source = f.read()
+        program, errors = session.parse(source)
+        if errors: res['errors'] = errors
+        else:
+            with contextlib.redirect_stdout(out): evaluated = session.Session(engine, budget).run(program)
+            res['type'] = evaluated.Type()
+            res['inspect'] = evaluated.Inspect()
+    except Exception as e:  # one bad script (say, a RecursionError) must not take its chunk down with it
+        res['errors'] = [f'{type(e).__name__}: {e}']
+    res['stdout'] = out.getvalue()
+    res['seconds'] = time.perf_counter() - t
+    return res
+
+def run_chunk(start: int, paths: list[str], engine: str, recursion_limit: int, budget: budget_.Budget | None) -> list[dict]:
+    sys.setrecursionlimit(recursion_limit)
+    return [run_script(start + i, p, engine, budget) for i, p in enumerate(paths)]
+
+def run(paths: list[str], engine: str = 'eval', workers: int | None = None, chunksize: int = 16,
+        order: str = SUBMISSION, budget: budget_.Budget | None = None) -> Iterator[dict]:
+    from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+    chunksize = max(1, chunksize)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures: list[Future] = [
+            pool.submit(run_chunk, i, paths[i:i+chunksize], engine, sys.getrecursionlimit(), budget)
+            for i in range(0, len(paths), chunksize)
+        ]
+        done = as_completed(futures) if order == COMPLETION else futures
+        for future in done:
+            try:
+                yield from future.result()
+            except Exception:
+                # the worker itself died (e.g. killed); report every script of the chunk
+                i = futures.index(future) * chunksize
+                for j, p in enumerate(paths[i:i+chunksize]):
+                    yield {'index': i + j, 'path': p, 'type': None, 'inspect': None,
+                           'errors': [traceback.format_exc(limit=1).strip()], 'stdout': '', 'seconds': None}
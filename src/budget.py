@@ -0,0 +1,124 @@
+import sys
+from contextlib import contextmanager
+from typing import Iterator
+
+from . import object_
+
+# Execution budgets for the tree walker. A Budget caps the nodes eval_ visits (steps), the
+# depth of nested (non-tail) calls and the approximate bytes allocated for strings, arrays and
+# hashes. Running out raises Exhausted, which evaluator.eval_ turns into an object_.Error at the
+# top of the evaluation. Allocation sizes are only charged while charging() is active: the
+# classes are patched for the duration, as object_.count_allocations does. range() and the
+# vector kernels call object_.allocating() before building a buffer, and charging() patches that
+# too, so a buffer the budget cannot cover is refused before it is built rather than after.
+
+# rough CPython sizes: object header plus payload
+STRING_BYTES = 56      # + 1 per character; a rope node is charged the header, and its length once flattened
+ARRAY_BYTES = 56       # + 8 per element, when the array gets a buffer of its own
+HASH_BYTES = 64        # + 100 per pair (dict slot, key and entry), or one copied path
+POINTER_BYTES = 8
+PAIR_BYTES = 100
+PATH_BYTES = 400       # the nodes a persistent hash update copies
+
+# The tree walker recurses in Python, about 13 frames per nested call (14 with the profiler or
+# memoization on), so a depth budget needs a recursion limit to match. Python's frames also use
+# the C stack, and the default 8 MB one crashes somewhere past 17000 of them: deeper budgets
+# are refused rather than allowed to crash.
+FRAMES_PER_CALL = 15
+MAX_DEPTH = 1000
+
+
+class Exhausted(Exception): pass
+
+
+class Budget:
+    __slots__ = ('max_steps', 'max_depth', 'max_bytes', 'step_cap', 'depth_cap', 'steps', 'depth', 'peak_depth', 'bytes_')
+
+    # None means unlimited
+    def __init__(self, steps: int | None = None, depth: int | None = None, bytes_: int | None = None):
+        if depth is not None and depth > MAX_DEPTH:
+            raise ValueError(f"call depth budgets above {MAX_DEPTH} are not supported: python's stack runs out first")
+        self.max_steps = steps
+        self.max_depth = depth
+        self.max_bytes = bytes_
+        # what the evaluator compares against, so an unlimited budget needs no None checks
+        self.step_cap = float('inf') if steps is None else steps
+        self.depth_cap = float('inf') if depth is None else depth
+        self.reset()
+
+    def reset(self) -> None:
+        self.steps = self.depth = self.peak_depth = self.bytes_ = 0
+
+    def limited(self) -> bool:
+        return self.max_steps is not None or self.max_depth is not None or self.max_bytes is not None
+
+    def charge(self, n: int) -> None:
+        self.bytes_ += n
+        if self.max_bytes is not None and self.bytes_ > self.max_bytes:
+            raise Exhausted(f'allocation budget exhausted: more than {self.max_bytes} bytes allocated')
+
+    def check(self, n: int) -> None:
+        # refuses n more bytes without counting them; the object made with them is charged as usual
+        if self.max_bytes is not None and self.bytes_ + n > self.max_bytes:
+            raise Exhausted(f'allocation budget exhausted: more than {self.max_bytes} bytes allocated')
+
+    def __str__(self) -> str:
+        return f'budget: {self.steps} steps, depth {self.peak_depth}, {self.bytes_} bytes allocated'
+
+
+def recursion_limit(b: Budget) -> int:
+    # enough python frames for max_depth nested calls on top of the current stack
+    frame, depth = sys._getframe(), 0
+    while frame is not None: frame, depth = frame.f_back, depth + 1
+    return depth + FRAMES_PER_CALL * b.max_depth + 100
+
+def steps_exhausted(b: Budget) -> Exhausted:
+    return Exhausted(f'step budget exhausted: more than {b.max_steps} nodes evaluated')
+
+def depth_exhausted(b: Budget) -> Exhausted:
+    return Exhausted(f'call depth budget exhausted: more than {b.max_depth} nested calls')
+
+
+@contextmanager
+def charging(b: Budget) -> Iterator[None]:
+    saved = {cls: cls.__dict__['__init__'] for cls in (object_.String, object_.Array, object_.Hash)}
+    string_init, array_init, hash_init = saved[object_.String], saved[object_.Array], saved[object_.Hash]
+    rope_init, rope_flatten = object_.Rope.__dict__['__init__'], object_.Rope.__dict__['flatten']
+    allocating = object_.allocating
+
+    def string(self, Value: str):
+        b.charge(STRING_BYTES + len(Value))
+        string_init(self, Value)
+
+    def array(self, Elements: list, start: int = 0, end: int | None = None):
+        # views made by rest() and in-place push() share their buffer; only a new buffer is charged
+        b.charge(ARRAY_BYTES + (POINTER_BYTES * len(Elements) if end is None and start == 0 else 0))
+        array_init(self, Elements, start, end)
+
+    def hash_(self, Pairs):
+        # a persistent version made by set()/delete() shares all but the path it changed
+        b.charge(HASH_BYTES + (PAIR_BYTES * len(Pairs) if Pairs.__class__ is dict else PATH_BYTES))
+        hash_init(self, Pairs)
+
+    def rope(self, left: object_.String, right: object_.String):
+        b.charge(STRING_BYTES)
+        rope_init(self, left, right)
+
+    def flatten(self):
+        # charged before joining, so an oversized string is refused before it exists
+        b.charge(STRING_BYTES + self.length)
+        rope_flatten(self)
+
+    def allocating_array(n: int):
+        # checked before a builtin or kernel builds the buffer; the Array made from it is charged as above
+        b.check(ARRAY_BYTES + POINTER_BYTES * n)
+
+    object_.String.__init__, object_.Array.__init__, object_.Hash.__init__ = string, array, hash_
+    object_.Rope.__init__, object_.Rope.flatten = rope, flatten
+    object_.allocating = allocating_array
+    try:
+        yield
+    finally:
+        for cls, init in saved.items(): cls.__init__ = init
+        object_.Rope.__init__, object_.Rope.flatten = rope_init, rope_flatten
+        object_.allocating = allocating
@@ -1,12 +1,11 @@
-from . import object_
-import copy
+from . import object_, vector
 
 def _len_builtin(args: list[object_.Object]) -> object_.Object:
     if len(args) > 1:
         return object_.Error(f'len function takes only 1 argument, but {len(args)} were given')
     s = args[0]
-    if s.Type() == object_.STRING_OBJ: return object_.Integer(len(s.Value))
-    if s.Type() == object_.ARRAY_OBJ: return object_.Integer(len(s.Elements))
+    if s.Type() == object_.STRING_OBJ: return object_.new_integer(s.size())
+    if s.Type() == object_.ARRAY_OBJ: return object_.new_integer(len(s))
     return object_.Error(f'cannot find len of {s.Type()} type object')
 
 
@@ -14,7 +13,7 @@ def _first_builtin(args: list[object_.Object]) -> object_.Object:
     if len(args) > 1:
         return object_.Error(f'first function takes only 1 argument, but {len(args)} were given')
     s = args[0]
-    if s.Type() == object_.ARRAY_OBJ: return s.Elements[0]
+    if s.Type() == object_.ARRAY_OBJ: return s[0]
     return object_.Error(f'cannot find first of {s.Type()} type object')
 
 
@@ -22,7 +21,7 @@ def _last_builtin(args: list[object_.Object]) -> object_.Object:
     if len(args) > 1:
         return object_.Error(f'last function takes only 1 argument, but {len(args)} were given')
     s = args[0]
-    if s.Type() == object_.ARRAY_OBJ: return s.Elements[-1]
+    if s.Type() == object_.ARRAY_OBJ: return s[-1]
     return object_.Error(f'cannot find last of {s.Type()} type object')
 
 
@@ -31,11 +30,7 @@ def _rest_builtin(args: list[object_.Object]) -> object_.Object:
         return object_.Error(f'rest function takes only 1 argument, but {len(args)} were given')
     s = args[0]
     if s.Type() != object_.ARRAY_OBJ: return object_.Error(f'cannot find rest of {s.Type()} type object')
-
-    new_elements: list[object_.Object] = []
-    for elem in s.Elements[1:]:
-        new_elements.append(copy.deepcopy(elem))
-    return object_.Array(new_elements)
+    return s.rest()
 
 
 def _push_builtin(args: list[object_.Object]) -> object_.Object:
@@ -43,16 +38,96 @@ def _push_builtin(args: list[object_.Object]) -> object_.Object:
         return object_.Error(f'push function takes only 2 argument, but {len(args)} were given')
     s = args[0]
     if s.Type() != object_.ARRAY_OBJ: return object_.Error(f'cannot push in {s.Type()} type object')
-
-    new_elements: list[object_.Object] = []
-    for elem in s.Elements: new_elements.append(copy.deepcopy(elem))
-    new_elements.append(args[1])
-    return object_.Array(new_elements)
+    return s.push(args[1])
 
 
 def _puts_builtin(args: list[object_.Object]) -> object_.Object:
     print(' '.join([x.Inspect() for x in args]))
-    return object_.Null()
+    return object_.NULL
+
+
+# ===
+# Vectorized builtins: they run over an array's raw ints (see vector.py) and box only the result
+# ===
+
+def _int_values(name: str, args: list[object_.Object]):
+    s = args[0]
+    if s.Type() != object_.ARRAY_OBJ: return object_.Error(f'cannot find {name} of {s.Type()} type object')
+    values = vector.ints(s)
+    if values is None: return object_.Error(f'{name} needs an array of integers')
+    return values
+
+def _sum_builtin(args: list[object_.Object]) -> object_.Object:
+    if len(args) != 1:
+        return object_.Error(f'sum function takes only 1 argument, but {len(args)} were given')
+    values = _int_values('sum', args)
+    if isinstance(values, object_.Error): return values
+    return object_.new_integer(vector.sum_(values))
+
+def _max_builtin(args: list[object_.Object]) -> object_.Object:
+    if len(args) != 1:
+        return object_.Error(f'max function takes only 1 argument, but {len(args)} were given')
+    values = _int_values('max', args)
+    if isinstance(values, object_.Error): return values
+    if len(values) == 0: return object_.Error('cannot find max of an empty array')
+    return object_.new_integer(vector.max_(values))
+
+def _min_builtin(args: list[object_.Object]) -> object_.Object:
+    if len(args) != 1:
+        return object_.Error(f'min function takes only 1 argument, but {len(args)} were given')
+    values = _int_values('min', args)
+    if isinstance(values, object_.Error): return values
+    if len(values) == 0: return object_.Error('cannot find min of an empty array')
+    return object_.new_integer(vector.min_(values))
+
+def _range_builtin(args: list[object_.Object]) -> object_.Object:
+    # range(end), range(start, end) or range(start, end, step), as in python
+    if not 1 <= len(args) <= 3:
+        return object_.Error(f'range function takes 1 to 3 arguments, but {len(args)} were given')
+    for a in args:
+        if a.Type() != object_.INTEGER_OBJ: return object_.Error(f'range arguments should be INTEGER. got={a.Type()}')
+    if len(args) == 3 and args[2].Value == 0: return object_.Error('range step cannot be zero')
+    r = range(*[a.Value for a in args])
+    try:
+        n = len(r)
+    except OverflowError:
+        return object_.Error(f'range too large: {r.start}, {r.stop}, {r.step}')
+    object_.allocating(n)
+    return object_.new_int_array(r)
+
+def _slice_builtin(args: list[object_.Object]) -> object_.Object:
+    # slice(arr, start) or slice(arr, start, end); a view sharing arr's buffer
+    if not 2 <= len(args) <= 3:
+        return object_.Error(f'slice function takes 2 or 3 arguments, but {len(args)} were given')
+    s = args[0]
+    if s.Type() != object_.ARRAY_OBJ: return object_.Error(f'cannot slice {s.Type()} type object')
+    for a in args[1:]:
+        if a.Type() != object_.INTEGER_OBJ: return object_.Error(f'slice bounds should be INTEGER. got={a.Type()}')
+        if a.Value < 0: return object_.Error(f'we do not support negative indexing; got {a.Value}')
+    return s.slice(args[1].Value, args[2].Value if len(args) == 3 else len(s))
+
+
+# ===
+# Functional hash updates: new hashes sharing structure with the old (see hamt.py)
+# ===
+
+HASHABLE = (object_.STRING_OBJ, object_.BOOLEAN_OBJ, object_.INTEGER_OBJ)
+
+def _set_builtin(args: list[object_.Object]) -> object_.Object:
+    if len(args) != 3:
+        return object_.Error(f'set function takes 3 arguments, but {len(args)} were given')
+    h, key = args[0], args[1]
+    if h.Type() != object_.HASH_OBJ: return object_.Error(f'cannot set in {h.Type()} type object')
+    if key.Type() not in HASHABLE: return object_.Error(f'key type should be one of STRING, BOOLEAN or INTEGER. got={key.Type()}')
+    return h.set(key, args[2])
+
+def _delete_builtin(args: list[object_.Object]) -> object_.Object:
+    if len(args) != 2:
+        return object_.Error(f'delete function takes 2 arguments, but {len(args)} were given')
+    h, key = args[0], args[1]
+    if h.Type() != object_.HASH_OBJ: return object_.Error(f'cannot delete from {h.Type()} type object')
+    if key.Type() not in HASHABLE: return object_.Error(f'key type should be one of STRING, BOOLEAN or INTEGER. got={key.Type()}')
+    return h.delete(key)
 
 
 builtins: dict[str, object_.BuiltIn] = {
@@ -62,4 +137,11 @@ builtins: dict[str, object_.BuiltIn] = {
     'rest': object_.BuiltIn(_rest_builtin),
     'push': object_.BuiltIn(_push_builtin),
     'puts': object_.BuiltIn(_puts_builtin),
+    'sum': object_.BuiltIn(_sum_builtin),
+    'max': object_.BuiltIn(_max_builtin),
+    'min': object_.BuiltIn(_min_builtin),
+    'range': object_.BuiltIn(_range_builtin),
+    'slice': object_.BuiltIn(_slice_builtin),
+    'set': object_.BuiltIn(_set_builtin),
+    'delete': object_.BuiltIn(_delete_builtin),
 }
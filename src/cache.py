@@ -0,0 +1,105 @@
+import hashlib
+import mmap
+import os
+import pickle
+from typing import Callable
+
+from . import ast
+
+# Content-addressed on-disk cache of parsed programs, in the spirit of .pyc files.
+#
+# An entry is named after the sha256 of the source plus a tag (e.g. whether the optimizer ran),
+# so editing a script simply addresses a different entry. Each file starts with a header of
+# MAGIC, the format version and a fingerprint of the ast classes' layouts; the pickled Program
+# follows. An entry whose header does not match, or whose body fails to load, is stale or
+# corrupt: it is deleted and the source is parsed again.
+
+MAGIC = b'MKYC'
+FORMAT_VERSION = 1
+DEFAULT_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'monkey')
+
+Parse = Callable[[str], tuple[ast.Program, list[str]]]
+
+stats = {'hits': 0, 'misses': 0, 'invalidated': 0, 'writes': 0}
+
+
+def ast_fingerprint() -> str:
+    # changes whenever a node class gains, loses or renames a field
+    layout = sorted((name, tuple(cls.__slots__)) for name, cls in vars(ast).items()
+                    if isinstance(cls, type) and issubclass(cls, ast.Node))
+    return hashlib.sha256(repr(layout).encode()).hexdigest()[:16]
+
+HEADER = MAGIC + FORMAT_VERSION.to_bytes(2, 'little') + ast_fingerprint().encode()
+
+
+def key(source: str, tag: str = '') -> str:
+    return hashlib.sha256(tag.encode() + b'\0' + source.encode()).hexdigest()
+
+def entry_path(cache_dir: str, source: str, tag: str = '') -> str:
+    k = key(source, tag)
+    return os.path.join(cache_dir, k[:2], k[2:] + '.mkc')
+
+
+def load(cache_dir: str, source: str, parse: Parse, tag: str = '') -> tuple[ast.Program, list[str]]:
+    path = entry_path(cache_dir, source, tag)
+    program = read_entry(path)
+    if program is not None:
+        stats['hits'] += 1
+        return program, []
+
+    stats['misses'] += 1
+    program, errors = parse(source)
+    if not errors: write_entry(path, program)  # programs with parse errors are never cached
+    return program, errors
+
+def read_entry(path: str) -> ast.Program | None:
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return None
+    try:
+        with f:
+            try:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                buf = f.read()  # empty file, or a filesystem that cannot map
+            try:
+                with memoryview(buf) as view:
+                    if view[:len(HEADER)] != HEADER: raise ValueError('stale cache entry')
+                    with view[len(HEADER):] as body: program = pickle.loads(body)
+            finally:
+                if isinstance(buf, mmap.mmap): buf.close()
+        if not isinstance(program, ast.Program): raise ValueError('not a program')
+        return program
+    except Exception:
+        invalidate(path)
+        return None
+
+def write_entry(path: str, program: ast.Program) -> None:
+    # written to a temporary file and renamed into place, so concurrent workers never see half an entry
+    import tempfile  # only misses write, and a cold run should not pay for it up front
+    tmp = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = pickle.dumps(program, protocol=pickle.HIGHEST_PROTOCOL)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER)
+            f.write(data)
+        os.replace(tmp, path)
+        stats['writes'] += 1
+    except (OSError, RecursionError, pickle.PicklingError):
+        # the cache is an optimization; failing to fill it is not an error
+        if tmp is not None and os.path.exists(tmp): os.remove(tmp)
+
+def invalidate(path: str) -> None:
+    stats['invalidated'] += 1
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def report() -> str:
+    total = stats['hits'] + stats['misses']
+    rate = f'{100 * stats["hits"] / total:.0f}%' if total else 'n/a'
+    return f'cache: {stats["hits"]} hits, {stats["misses"]} misses ({rate} hit rate), {stats["invalidated"]} invalidated, {stats["writes"]} written'
@@ -0,0 +1,293 @@
+from typing import Callable
+
+from . import ast, object_, evaluator
+from .builtins_ import builtins
+
+# Lowers the AST into a tree of Python closures, one per node, with children pre-bound.
+# Each closure takes an Environment and returns exactly what eval_ would for that node,
+# so running the result never has to inspect node types again.
+
+Compiled = Callable[[object_.Environment], object_.Object]
+
+NULL = evaluator.NULL
+TRUE = evaluator.TRUE
+FALSE = evaluator.FALSE
+new_error = evaluator.new_error
+
+
+def compile_(node: ast.Node | None) -> Compiled:
+    if isinstance(node, ast.Program): return compile_program(node)
+    if isinstance(node, ast.ExpressionStatement): return compile_(node.Expression_)
+    if isinstance(node, ast.IntegerLiteral): return compile_constant(object_.Integer(node.Value))
+    if isinstance(node, ast.StringLiteral): return compile_constant(object_.String(node.Value))
+    if isinstance(node, ast.Boolean): return compile_constant(TRUE if node.Value else FALSE)
+    if isinstance(node, ast.PrefixExpression): return compile_prefix_expression(node)
+    if isinstance(node, ast.InfixExpression): return compile_infix_expression(node)
+    if isinstance(node, ast.IFExpression): return compile_if_expression(node)
+    if isinstance(node, ast.BlockStatement): return compile_block_statements(node)
+    if isinstance(node, ast.ReturnStatement): return compile_return_statement(node)
+    if isinstance(node, ast.LetStatement): return compile_let_statement(node)
+    if isinstance(node, ast.Identifier): return compile_identifier(node)
+    if isinstance(node, ast.FunctionLiteral): return compile_function_literal(node)
+    if isinstance(node, ast.CallExpression): return compile_call_expression(node)
+    if isinstance(node, ast.ArrayLiteral): return compile_array_literal(node)
+    if isinstance(node, ast.IndexExpression): return compile_index_expression(node)
+    if isinstance(node, ast.HashLiteral): return compile_hash_literal(node)
+    return compile_constant(NULL)
+
+def run(node: ast.Node, env: object_.Environment) -> object_.Object:
+    return compile_(node)(env)
+
+
+def compile_constant(obj: object_.Object) -> Compiled:
+    # literals are never mutated, so one object per literal site is enough
+    def constant(env): return obj
+    return constant
+
+def compile_program(node: ast.Program) -> Compiled:
+    stmts = [compile_(s) for s in node.Statements]
+    ReturnValue, Error = object_.ReturnValue, object_.Error
+    def program(env):
+        ret = NULL
+        for stmt in stmts:
+            ret = stmt(env)
+            cls = ret.__class__
+            if cls is ReturnValue: return ret.Value
+            if cls is Error: return ret
+        return ret
+    return program
+
+def compile_block_statements(node: ast.BlockStatement) -> Compiled:
+    stmts = [compile_(s) for s in node.Statements]
+    ReturnValue, Error = object_.ReturnValue, object_.Error
+    if len(stmts) == 1: return stmts[0]
+    def block(env):
+        ret = NULL
+        for stmt in stmts:
+            ret = stmt(env)
+            cls = ret.__class__
+            if cls is ReturnValue or cls is Error: return ret
+        return ret
+    return block
+
+def compile_prefix_expression(node: ast.PrefixExpression) -> Compiled:
+    right_fn = compile_(node.Right)
+    operator = node.Operator
+    Error = object_.Error
+    def prefix(env):
+        right = right_fn(env)
+        if right.__class__ is Error: return right
+        return evaluator.evaluate_prefix_expression(operator, right)
+    return prefix
+
+def compile_infix_expression(node: ast.InfixExpression) -> Compiled:
+    left_fn = compile_(node.Left)
+    right_fn = compile_(node.Right)
+    operator = node.Operator
+    Error, Integer = object_.Error, object_.Integer
+    slow = evaluator.evaluate_infix_expression
+
+    def generic(env):
+        left = left_fn(env)
+        if left.__class__ is Error: return left
+        right = right_fn(env)
+        if right.__class__ is Error: return right
+        return slow(operator, left, right)
+
+    # integer fast paths, specialized per operator; everything else goes through the evaluator
+    if operator == '+':
+        def add(env):
+            left = left_fn(env)
+            if left.__class__ is Error: return left
+            right = right_fn(env)
+            if left.__class__ is Integer and right.__class__ is Integer: return Integer(left.Value + right.Value)
+            if right.__class__ is Error: return right
+            return slow(operator, left, right)
+        return add
+    if operator == '-':
+        def sub(env):
+            left = left_fn(env)
+            if left.__class__ is Error: return left
+            right = right_fn(env)
+            if left.__class__ is Integer and right.__class__ is Integer: return Integer(left.Value - right.Value)
+            if right.__class__ is Error: return right
+            return slow(operator, left, right)
+        return sub
+    if operator == '*':
+        def mul(env):
+            left = left_fn(env)
+            if left.__class__ is Error: return left
+            right = right_fn(env)
+            if left.__class__ is Integer and right.__class__ is Integer: return Integer(left.Value * right.Value)
+            if right.__class__ is Error: return right
+            return slow(operator, left, right)
+        return mul
+    if operator == '==':
+        def eq(env):
+            left = left_fn(env)
+            if left.__class__ is Error: return left
+            right = right_fn(env)
+            if left.__class__ is Integer and right.__class__ is Integer: return TRUE if left.Value == right.Value else FALSE
+            if right.__class__ is Error: return right
+            return slow(operator, left, right)
+        return eq
+    if operator == '<':
+        def lt(env):
+            left = left_fn(env)
+            if left.__class__ is Error: return left
+            right = right_fn(env)
+            if left.__class__ is Integer and right.__class__ is Integer: return TRUE if left.Value < right.Value else FALSE
+            if right.__class__ is Error: return right
+            return slow(operator, left, right)
+        return lt
+    if operator == '>':
+        def gt(env):
+            left = left_fn(env)
+            if left.__class__ is Error: return left
+            right = right_fn(env)
+            if left.__class__ is Integer and right.__class__ is Integer: return TRUE if left.Value > right.Value else FALSE
+            if right.__class__ is Error: return right
+            return slow(operator, left, right)
+        return gt
+    return generic
+
+def compile_if_expression(node: ast.IFExpression) -> Compiled:
+    cond_fn = compile_(node.Condition)
+    cons_fn = compile_(node.Consequence)
+    alt_fn = compile_(node.Alternative)
+    Error = object_.Error
+    def if_(env):
+        cond = cond_fn(env)
+        if cond is TRUE: return cons_fn(env)
+        if cond is FALSE: return alt_fn(env)
+        if cond.__class__ is Error: return cond
+        return cons_fn(env) if cond.Value else alt_fn(env)
+    return if_
+
+def compile_return_statement(node: ast.ReturnStatement) -> Compiled:
+    value_fn = compile_(node.Value)
+    ReturnValue, Error = object_.ReturnValue, object_.Error
+    def return_(env):
+        res = value_fn(env)
+        if res.__class__ is Error: return res
+        return ReturnValue(res)
+    return return_
+
+def compile_let_statement(node: ast.LetStatement) -> Compiled:
+    value_fn = compile_(node.Value)
+    name = node.Name.Value
+    version = object_.version(name)
+    def let(env):
+        val = value_fn(env)
+        e = env.e
+        if name not in e: version[0] += 1  # may shadow a binding further out
+        e[name] = val
+        return NULL
+    return let
+
+def compile_identifier(node: ast.Identifier) -> Compiled:
+    # A site always sees the same chain of environments: its own function's, then the one each
+    # enclosing function literal was evaluated in. Names only ever join an environment through
+    # parameters, which are the same on every call, or a let, which bumps the name's version. So
+    # once a name has been found some environments out (or among the builtins), it is found there
+    # again for as long as the version stands, and the walk can jump straight to it.
+    name = node.Value
+    builtin = builtins.get(name, None)
+    version = object_.version(name)
+    seen = -1
+    where = 0  # how many environments out name was found; 0 for the builtin
+    def identifier(env):
+        nonlocal seen, where
+        val = env.e.get(name, None)
+        if val is not None: return val
+        if seen == version[0]:
+            if not where: return builtin
+            scope, n = env, where
+            while n:
+                scope = scope.outer
+                n -= 1
+            val = scope.e.get(name, None)
+            if val is not None: return val
+        scope, n = env.outer, 1
+        while scope is not None:
+            val = scope.e.get(name, None)
+            if val is not None:
+                seen, where = version[0], n
+                return val
+            scope = scope.outer
+            n += 1
+        if builtin is not None:
+            seen, where = version[0], 0
+            return builtin
+        return new_error(f'identifier not found: {name}')
+    return identifier
+
+def compile_function_literal(node: ast.FunctionLiteral) -> Compiled:
+    body = compile_(node.Body)
+    params, body_node = node.Parameters, node.Body
+    Function = object_.Function
+    def function(env):
+        return Function(Params=params, Body=body_node, env=env, compiled=body)
+    return function
+
+def compile_call_expression(node: ast.CallExpression) -> Compiled:
+    func_fn = compile_(node.Function)
+    arg_fns = [compile_(a) for a in node.Arguments]
+    nargs = len(arg_fns)
+    Error, Function, ReturnValue, Environment = object_.Error, object_.Function, object_.ReturnValue, object_.Environment
+    def call(env):
+        func = func_fn(env)
+        if func.__class__ is Error: return func
+        args = []
+        for arg_fn in arg_fns:
+            res = arg_fn(env)
+            if res.__class__ is Error: return res
+            args.append(res)
+
+        if func.__class__ is Function and func.compiled is not None:
+            if len(func.Params) != nargs: return new_error(f'len of args dont match len of parameters: {nargs} != {len(func.Params)}')
+            new_env = Environment(func.env)
+            e = new_env.e
+            for p, a in zip(func.Params, args): e[p.Value] = a
+            evaluated = func.compiled(new_env)
+            if evaluated.__class__ is ReturnValue: return evaluated.Value
+            return evaluated
+        return evaluator.apply_function(func, args)
+    return call
+
+def compile_array_literal(node: ast.ArrayLiteral) -> Compiled:
+    elem_fns = [compile_(e) for e in node.Elements]
+    Error, new_array = object_.Error, object_.new_array
+    def array(env):
+        elements = []
+        for elem_fn in elem_fns:
+            res = elem_fn(env)
+            if res.__class__ is Error: return res
+            elements.append(res)
+        return new_array(elements)
+    return array
+
+def compile_index_expression(node: ast.IndexExpression) -> Compiled:
+    left_fn = compile_(node.Left)
+    right_fn = compile_(node.Right)
+    Error = object_.Error
+    def index(env):
+        left = left_fn(env)
+        if left.__class__ is Error: return left
+        if left.Type() not in (object_.ARRAY_OBJ, object_.HASH_OBJ): return new_error(f'left is not array or hash, got {left.Type()}')
+        right = right_fn(env)
+        if right.__class__ is Error: return right
+        return evaluator.evaluate_index(left, right)
+    return index
+
+def compile_hash_literal(node: ast.HashLiteral) -> Compiled:
+    pair_fns = [(compile_(k), compile_(v)) for k, v in node.Elements]
+    def hash_(env):
+        result = {}
+        for key_fn, value_fn in pair_fns:
+            key = key_fn(env)
+            if key.Type() not in (object_.STRING_OBJ, object_.BOOLEAN_OBJ, object_.INTEGER_OBJ):
+                return new_error(f'key type should be one of STRING, BOOLEAN or INTEGER. got={key.Type()}')
+            result[key.HashKey()] = (key, value_fn(env))
+        return object_.Hash(result)
+    return hash_
@@ -0,0 +1,398 @@
+from . import ast, object_, resolver
+
+# ===
+# Opcodes
+# ===
+# Instructions are a flat list of ints: an opcode followed by its operands.
+
+OP_CONSTANT         = 0   # const_idx
+OP_POP              = 1
+OP_TRUE             = 2
+OP_FALSE            = 3
+OP_NULL             = 4
+
+OP_ADD              = 5
+OP_SUB              = 6
+OP_MUL              = 7
+OP_DIV              = 8
+OP_EQ               = 9
+OP_NOT_EQ           = 10
+OP_GT               = 11
+OP_LT               = 12
+
+OP_MINUS            = 13
+OP_BANG             = 14
+
+OP_JUMP             = 15  # target
+OP_JUMP_NOT_TRUTHY  = 16  # target
+
+OP_GET_GLOBAL       = 17  # global_idx
+OP_SET_GLOBAL       = 18  # global_idx
+OP_GET_LOCAL        = 19  # local_idx
+OP_SET_LOCAL        = 20  # local_idx
+OP_GET_CELL         = 21  # local_idx
+OP_SET_CELL         = 22  # local_idx
+OP_GET_FREE         = 23  # free_idx
+OP_LOAD_FREE        = 24  # free_idx
+
+OP_ARRAY            = 25  # num_elements
+OP_HASH             = 26  # num_pairs
+OP_INDEX            = 27
+
+OP_CALL             = 28  # num_args
+OP_RETURN_VALUE     = 29
+OP_CLOSURE          = 30  # const_idx, num_free
+
+OP_PROTECT          = 31  # handler_target
+OP_UNPROTECT        = 32
+
+OP_WRAP_RETURN      = 33
+OP_UNWRAP_RETURN    = 34
+OP_JUMP_IF_RETURN   = 35  # target
+
+OPERAND_COUNTS = {
+    OP_CONSTANT: 1, OP_JUMP: 1, OP_JUMP_NOT_TRUTHY: 1,
+    OP_GET_GLOBAL: 1, OP_SET_GLOBAL: 1, OP_GET_LOCAL: 1, OP_SET_LOCAL: 1,
+    OP_GET_CELL: 1, OP_SET_CELL: 1, OP_GET_FREE: 1, OP_LOAD_FREE: 1,
+    OP_ARRAY: 1, OP_HASH: 1, OP_CALL: 1, OP_CLOSURE: 2,
+    OP_PROTECT: 1, OP_JUMP_IF_RETURN: 1,
+}
+
+OP_NAMES = {v: k for k, v in globals().items() if k.startswith('OP_') and isinstance(v, int)}
+
+INFIX_OPS = {
+    '+': OP_ADD, '-': OP_SUB, '*': OP_MUL, '/': OP_DIV,
+    '==': OP_EQ, '!=': OP_NOT_EQ, '>': OP_GT, '<': OP_LT,
+}
+PREFIX_OPS = {'-': OP_MINUS, '!': OP_BANG}
+
+# nodes whose evaluation cannot raise, so a let or hash needs no handler around them
+NO_ERRORS = (ast.IntegerLiteral, ast.StringLiteral, ast.Boolean, ast.FunctionLiteral)
+
+def disassemble(instructions: list[int]) -> str:
+    out = []
+    ip = 0
+    while ip < len(instructions):
+        op = instructions[ip]
+        n = OPERAND_COUNTS.get(op, 0)
+        operands = instructions[ip+1: ip+1+n]
+        out.append(f'{ip:04d} {OP_NAMES[op]} ' + ' '.join([str(x) for x in operands]))
+        ip += 1 + n
+    return '\n'.join([x.rstrip() for x in out])
+
+
+# ===
+# Symbol Table
+# ===
+# Scoping is the resolver's, so names mean what they mean to eval_. A function's locals are the
+# slots of its resolver.Scope: one per parameter (the last of two same-named ones wins) and one
+# per let anywhere in its body, laid out before the body is compiled. Slots an inner function
+# reads are CELL locals, boxed on each call so the closure sees later lets; the inner function
+# reaches them as FREE symbols through its closure's cells. Top-level names, builtins included,
+# are late-bound globals.
+
+GLOBAL_SCOPE = "GLOBAL"
+LOCAL_SCOPE  = "LOCAL"
+CELL_SCOPE   = "CELL"
+FREE_SCOPE   = "FREE"
+
+class Symbol:
+    def __init__(self, name: str, scope: str, index: int):
+        self.name = name
+        self.scope = scope
+        self.index = index
+
+class SymbolTable:
+    def __init__(self, outer: "SymbolTable" = None, literal: ast.FunctionLiteral | None = None):
+        self.outer = outer
+        self.store: dict[str, Symbol] = {}  # global names, in the global table
+        self.num_definitions = 0
+        self.num_params = 0
+        self.locals_: list[Symbol | None] = []
+        self.free_symbols: list[Symbol] = []  # what the closure captures, as symbols of the enclosing table
+        self.free: dict[tuple[int, int], Symbol] = {}
+        if literal is not None:
+            scope = literal.Scope
+            self.num_definitions = scope.size
+            self.num_params = len(literal.Parameters)
+            self.locals_ = [None] * scope.size
+            for name, slot in scope.names.items():
+                self.locals_[slot] = Symbol(name, CELL_SCOPE if slot in scope.captured else LOCAL_SCOPE, slot)
+
+    def define(self, name: str) -> Symbol:
+        sym = self.store.get(name, None)
+        if sym is not None: return sym  # redefinition reuses the slot
+
+        sym = Symbol(name, GLOBAL_SCOPE, self.num_definitions)
+        self.store[name] = sym
+        self.num_definitions += 1
+        return sym
+
+    def lookup(self, depth: int, slot: int) -> Symbol:
+        # the symbol for a resolver candidate: a local of this table, or of the function depth levels out
+        if depth == 0: return self.locals_[slot]
+        sym = self.free.get((depth, slot), None)
+        if sym is None:
+            original = self.outer.lookup(depth - 1, slot)
+            self.free_symbols.append(original)
+            sym = self.free[(depth, slot)] = Symbol(original.name, FREE_SCOPE, len(self.free_symbols) - 1)
+        return sym
+
+    def may_be_unset(self, depth: int, slot: int) -> bool:
+        # parameters are bound on entry; a let's slot is empty until the let has run
+        table = self
+        for _ in range(depth): table = table.outer
+        return slot >= table.num_params
+
+    def cells(self) -> tuple[int, ...]:
+        return tuple([sym.index for sym in self.locals_ if sym is not None and sym.scope == CELL_SCOPE])
+
+    def global_table(self) -> "SymbolTable":
+        return self if self.outer is None else self.outer.global_table()
+
+def new_symbol_table() -> SymbolTable:
+    return SymbolTable()
+
+
+# ===
+# Compiler
+# ===
+
+class Bytecode:
+    def __init__(self, instructions: list[int], constants: list[object_.Object], global_names: list[str]):
+        self.instructions = instructions
+        self.constants = constants
+        self.global_names = global_names  # global_idx -> name, for "identifier not found" errors
+
+class Compiler:
+    def __init__(self, symbol_table: SymbolTable | None = None, constants: list[object_.Object] | None = None):
+        self.symbol_table = symbol_table if symbol_table is not None else new_symbol_table()
+        self.constants = constants if constants is not None else []
+        self.scopes: list[list[int]] = [[]]
+        self.fallbacks: list[dict[int, tuple]] = [{}]
+        # per function: the jumps that carry a ReturnValue out, to the function's end and then to
+        # the end of each enclosing if used as a value
+        self.returns: list[list[int]] = [[]]
+        self._constant_idx: dict[tuple, int] = {}
+
+    @property
+    def instructions(self) -> list[int]: return self.scopes[-1]
+
+    def emit(self, op: int, *operands: int) -> int:
+        pos = len(self.instructions)
+        self.instructions.append(op)
+        self.instructions.extend(operands)
+        return pos
+
+    def add_constant(self, obj: object_.Object) -> int:
+        self.constants.append(obj)
+        return len(self.constants) - 1
+
+    def add_literal_constant(self, obj: object_.Object) -> int:
+        # integer and string literals are immutable, so equal ones share a slot
+        key = (obj.Type(), obj.Value)
+        idx = self._constant_idx.get(key, None)
+        if idx is None:
+            idx = self._constant_idx[key] = self.add_constant(obj)
+        return idx
+
+    def bytecode(self) -> Bytecode:
+        gt = self.symbol_table.global_table()
+        global_names = [''] * gt.num_definitions
+        for sym in gt.store.values(): global_names[sym.index] = sym.name
+        return Bytecode(self.instructions, self.constants, global_names)
+
+    def compile(self, node: ast.Node) -> None:
+        if isinstance(node, ast.Program):
+            resolver.resolve(node)
+            self.compile_statements(node.Statements)
+            self.emit(OP_RETURN_VALUE)
+            self.patch_returns()
+            return
+
+        if isinstance(node, ast.ExpressionStatement):
+            expr = node.Expression_
+            if expr is None: self.emit(OP_NULL)
+            elif isinstance(expr, ast.IFExpression): self.compile_if(expr, value=False)
+            else:
+                self.compile(expr)
+                # a ReturnValue kept as a value (by a let, say) acts as a return once it is a statement's value
+                if isinstance(expr, (ast.Identifier, ast.CallExpression, ast.IndexExpression)):
+                    self.returns[-1].append(self.emit(OP_JUMP_IF_RETURN, -1))
+            return
+
+        if isinstance(node, ast.IntegerLiteral):
+            self.emit(OP_CONSTANT, self.add_literal_constant(object_.Integer(node.Value)))
+            return
+
+        if isinstance(node, ast.StringLiteral):
+            self.emit(OP_CONSTANT, self.add_literal_constant(object_.String(node.Value)))
+            return
+
+        if isinstance(node, ast.Boolean):
+            self.emit(OP_TRUE if node.Value else OP_FALSE)
+            return
+
+        if isinstance(node, ast.PrefixExpression):
+            self.compile(node.Right)
+            self.emit(PREFIX_OPS[node.Operator])
+            return
+
+        if isinstance(node, ast.InfixExpression):
+            self.compile(node.Left)
+            self.compile(node.Right)
+            self.emit(INFIX_OPS[node.Operator])
+            return
+
+        if isinstance(node, ast.IFExpression):
+            self.compile_if(node, value=True)
+            return
+
+        if isinstance(node, ast.BlockStatement):
+            self.compile_statements(node.Statements)
+            return
+
+        if isinstance(node, ast.ReturnStatement):
+            if node.Value is None: self.emit(OP_NULL)
+            else: self.compile(node.Value)
+            if len(self.returns) == 1: self.emit(OP_RETURN_VALUE)
+            else:
+                # inside an if used as a value, eval_ hands the return to whatever uses that value
+                self.emit(OP_WRAP_RETURN)
+                self.returns[-1].append(self.emit(OP_JUMP, -1))
+            return
+
+        if isinstance(node, ast.LetStatement):
+            self.compile_protected(node.Value)
+            resolved = node.Name.Resolved
+            if resolved: self.store_symbol(self.symbol_table.lookup(*resolved[0]))
+            else: self.store_symbol(self.symbol_table.global_table().define(node.Name.Value))
+            return
+
+        if isinstance(node, ast.Identifier):
+            self.load_identifier(node)
+            return
+
+        if isinstance(node, ast.FunctionLiteral):
+            self.compile_function_literal(node)
+            return
+
+        if isinstance(node, ast.CallExpression):
+            self.compile(node.Function)
+            for arg in node.Arguments: self.compile(arg)
+            self.emit(OP_CALL, len(node.Arguments))
+            return
+
+        if isinstance(node, ast.ArrayLiteral):
+            for elem in node.Elements: self.compile(elem)
+            self.emit(OP_ARRAY, len(node.Elements))
+            return
+
+        if isinstance(node, ast.IndexExpression):
+            self.compile(node.Left)
+            self.compile(node.Right)
+            self.emit(OP_INDEX)
+            return
+
+        if isinstance(node, ast.HashLiteral):
+            # like eval_, a hash holds an error raised by one of its values; one from a key is a bad key
+            for k, v in node.Elements:
+                self.compile_protected(k)
+                self.compile_protected(v)
+            self.emit(OP_HASH, len(node.Elements))
+            return
+
+        self.emit(OP_NULL)
+
+    def compile_statements(self, statements: list[ast.Statement]) -> None:
+        # a statement list leaves exactly one value on the stack: that of its last statement (NULL for let/empty)
+        if len(statements) == 0:
+            self.emit(OP_NULL)
+            return
+        for i, stmt in enumerate(statements):
+            self.compile(stmt)
+            if isinstance(stmt, ast.LetStatement): self.emit(OP_NULL)
+            if i != len(statements) - 1: self.emit(OP_POP)
+
+    def compile_protected(self, node: ast.Node) -> None:
+        # like eval_, an error raised while computing the value is left as the value instead of aborting
+        if isinstance(node, NO_ERRORS):
+            self.compile(node)
+            return
+        protect = self.emit(OP_PROTECT, -1)
+        self.compile(node)
+        self.emit(OP_UNPROTECT)
+        self.instructions[protect+1] = len(self.instructions)
+
+    def compile_if(self, node: ast.IFExpression, value: bool) -> None:
+        # a return inside an if used as a value gives that if a ReturnValue, as in eval_
+        if value: self.returns.append([])
+        self.compile(node.Condition)
+        jump_not_truthy = self.emit(OP_JUMP_NOT_TRUTHY, -1)
+        self.compile(node.Consequence)
+        jump = self.emit(OP_JUMP, -1)
+        self.instructions[jump_not_truthy+1] = len(self.instructions)
+        if node.Alternative is None: self.emit(OP_NULL)
+        else: self.compile(node.Alternative)
+        self.instructions[jump+1] = len(self.instructions)
+        if value:
+            for pos in self.returns.pop(): self.instructions[pos+1] = len(self.instructions)
+
+    def patch_returns(self) -> None:
+        # a ReturnValue reaching a statement of the function itself returns what it holds
+        jumps = self.returns[-1]
+        if not jumps: return
+        for pos in jumps: self.instructions[pos+1] = len(self.instructions)
+        self.emit(OP_UNWRAP_RETURN)
+        self.emit(OP_RETURN_VALUE)
+
+    def compile_function_literal(self, node: ast.FunctionLiteral) -> None:
+        self.scopes.append([])
+        self.fallbacks.append({})
+        returns, self.returns = self.returns, [[]]
+        self.symbol_table = SymbolTable(outer=self.symbol_table, literal=node)
+
+        self.compile(node.Body)
+        self.emit(OP_RETURN_VALUE)
+        self.patch_returns()
+
+        table = self.symbol_table
+        instructions = self.scopes.pop()
+        fallbacks = self.fallbacks.pop()
+        self.returns = returns
+        self.symbol_table = table.outer
+
+        for sym in table.free_symbols: self.load_cell(sym)
+        fn = object_.CompiledFunction(instructions, table.num_definitions, len(node.Parameters), node,
+                                      cells=table.cells(), fallbacks=fallbacks)
+        self.emit(OP_CLOSURE, self.add_constant(fn), len(table.free_symbols))
+
+    def load_identifier(self, node: ast.Identifier) -> None:
+        resolved = node.Resolved
+        gt = self.symbol_table.global_table()
+        if not resolved:
+            # no function binds the name: a late-bound global, which the VM reports if still unset when read
+            self.load_symbol(gt.define(node.Value))
+            return
+        syms = [self.symbol_table.lookup(depth, slot) for depth, slot in resolved]
+        pos = self.load_symbol(syms[0])
+        if self.symbol_table.may_be_unset(*resolved[0]):
+            # read before its let has run: the VM tries the other candidates, then the global, as eval_ does
+            candidates = syms[1:] + [gt.define(node.Value)]
+            self.fallbacks[-1][pos] = (node.Value, tuple([(sym.scope, sym.index) for sym in candidates]))
+
+    def load_symbol(self, sym: Symbol) -> int:
+        if sym.scope == GLOBAL_SCOPE: return self.emit(OP_GET_GLOBAL, sym.index)
+        if sym.scope == LOCAL_SCOPE: return self.emit(OP_GET_LOCAL, sym.index)
+        if sym.scope == CELL_SCOPE: return self.emit(OP_GET_CELL, sym.index)
+        return self.emit(OP_GET_FREE, sym.index)
+
+    def load_cell(self, sym: Symbol) -> None:
+        # the cell itself, for a closure to share: a CELL local's slot holds it as is
+        if sym.scope == CELL_SCOPE: self.emit(OP_GET_LOCAL, sym.index)
+        else: self.emit(OP_LOAD_FREE, sym.index)
+
+    def store_symbol(self, sym: Symbol) -> None:
+        if sym.scope == GLOBAL_SCOPE: self.emit(OP_SET_GLOBAL, sym.index)
+        elif sym.scope == LOCAL_SCOPE: self.emit(OP_SET_LOCAL, sym.index)
+        else: self.emit(OP_SET_CELL, sym.index)
@@ -1,15 +1,24 @@
-from . import ast, object_
+import sys
+
+from . import ast, object_, budget as budget_, jit, memo, profiler, resolver, vector
 from .builtins_ import builtins
 
 def new_error(msg):
     return object_.Error(msg)
 
 
-NULL = object_.Null()
-TRUE = object_.Boolean(True)
-FALSE = object_.Boolean(False)
+NULL = object_.NULL
+TRUE = object_.TRUE
+FALSE = object_.FALSE
+
+meter: budget_.Budget | None = None  # budget of the evaluation in progress, if it has one
+
+def eval_(node: ast.Node, env: object_.Environment, budget: budget_.Budget | None = None) -> object_.Object:
+    if budget is not None: return evaluate_budgeted(node, env, budget)
+    if meter is not None:
+        meter.steps += 1
+        if meter.steps > meter.step_cap: raise budget_.steps_exhausted(meter)
 
-def eval_(node: ast.Node, env: object_.Environment) -> object_.Object:
     if isinstance(node, ast.Program):
         return evaluate_program(node, env)
 
@@ -52,30 +61,29 @@ def eval_(node: ast.Node, env: object_.Environment) -> object_.Object:
 
     if isinstance(node, ast.LetStatement):
         val = eval_(node.Value, env)
-        env.set_(node.Name.Value, val)
+        resolved = node.Name.Resolved
+        if resolved: env.slots[resolved[0][1]] = val
+        else: env.set_(node.Name.Value, val)
         return NULL
 
     if isinstance(node, ast.Identifier):
-        val = env.get(node.Value)
-        if val is not None: return val
-        val = builtins.get(node.Value, None)
-        if val is not None: return val
-        return new_error(f'identifier not found: {node.Value}')
+        return evaluate_identifier(node, env)
 
     if isinstance(node, ast.FunctionLiteral):
-        return object_.Function(Params=node.Parameters, Body=node.Body, env=env)
+        return object_.Function(Params=node.Parameters, Body=node.Body, env=env, scope=node.Scope)
 
     if isinstance(node, ast.CallExpression):
         func = eval_(node.Function, env)
         if isinstance(func, object_.Error): return func
         args = evaluate_expressions(node.Arguments, env)
         if len(args) == 1 and isinstance(args[0], object_.Error): return args[0]
+        if node.Tail and isinstance(func, object_.Function): return object_.TailCall(func, args)
         return apply_function(func, args)
 
     if isinstance(node, ast.ArrayLiteral):
         Elements = evaluate_expressions(node.Elements, env)
         if len(Elements) == 1 and isinstance(Elements[0], object_.Error): return Elements[0]
-        return object_.Array(Elements)
+        return object_.new_array(Elements)
 
     if isinstance(node, ast.IndexExpression):
         return evaluate_index_expression(node, env)
@@ -83,12 +91,40 @@ def eval_(node: ast.Node, env: object_.Environment) -> object_.Object:
     if isinstance(node, ast.HashLiteral):
         Elements = evaluate_pairs(node.Elements, env)
         if isinstance(Elements, object_.Error): return Elements
-        return object_.Hash(Elements=Elements)
+        return object_.Hash(Elements)
 
 
     return NULL
 
+def evaluate_identifier(node: ast.Identifier, env: object_.Environment | object_.Frame) -> object_.Object:
+    resolved = node.Resolved
+    if resolved is None: val = env.get(node.Value)
+    else:
+        for depth, slot in resolved:
+            frame = env
+            while depth:
+                frame = frame.outer
+                depth -= 1
+            val = frame.slots[slot]
+            if val is not None: return val
+        g = env.globals_ if env.__class__ is object_.Frame else env
+        cache = node.Cache
+        if cache is not None and cache[0] is g and cache[1] == cache[2][0]: return cache[3]
+        val = g.get(node.Value)
+        if val is None: val = builtins.get(node.Value, None)
+        if val is not None:
+            cell = object_.version(node.Value)
+            node.Cache = (g, cell[0], cell, val)
+            return val
+    if val is not None: return val
+    val = builtins.get(node.Value, None)
+    if val is not None: return val
+    return new_error(f'identifier not found: {node.Value}')
+
 def evaluate_program(node: ast.Node, env: object_.Environment) -> object_.Object:
+    resolver.resolve(node)
+    mark_tail_calls(node)
+    if profiler.enabled: profiler.name_functions(node)
     ret = NULL
     for stmt in node.Statements:
         ret = eval_(stmt, env)
@@ -136,6 +172,7 @@ def evaluate_infix_expression(operator: str, left: object_.Object, right: object
     if left.Type() == object_.INTEGER_OBJ: return evaluate_integer_infix_expression(operator, left, right)
     if left.Type() == object_.BOOLEAN_OBJ: return evaluate_boolean_infix_expression(operator, left, right)
     if left.Type() == object_.STRING_OBJ: return evaluate_string_infix_expression(operator, left, right)
+    if left.Type() == object_.ARRAY_OBJ and operator in vector.OPERATORS: return evaluate_array_infix_expression(operator, left, right)
 
     if not (
         (isinstance(left, object_.Integer) or isinstance(left, object_.Boolean)) and
@@ -165,9 +202,16 @@ def evaluate_boolean_infix_expression(operator, left, right):
     return new_error(f"unknown operator: {left.Type()} {operator} {right.Type()}")
 
 def evaluate_string_infix_expression(operator, left, right):
-    if operator == '+': return object_.String(left.Value + right.Value)
+    if operator == '+': return object_.concat(left, right)
     return new_error(f"unknown operator: {left.Type()} {operator} {right.Type()}")
 
+def evaluate_array_infix_expression(operator, left, right):
+    # elementwise, over the raw ints
+    a, b = vector.ints(left), vector.ints(right)
+    if a is None or b is None: return new_error(f'elementwise {operator} needs arrays of integers')
+    if len(a) != len(b): return new_error(f'array length mismatch: {len(a)} {operator} {len(b)}')
+    object_.allocating(len(a))
+    return object_.new_int_array(vector.elementwise(operator, a, b))
 
 
 def evaluate_expressions(nodes: list[ast.Node], env: object_.Environment) -> list[object_.Object]:
@@ -179,15 +223,47 @@ def evaluate_expressions(nodes: list[ast.Node], env: object_.Environment) -> lis
     return results
 
 def apply_function(func: object_.Object, args: list[object_.Object]) -> object_.Object:
-    if isinstance(func, object_.Function):
-        new_env = object_.Environment(func.env)
+    if meter is not None: return metered_call(func, args)
+    if profiler.enabled: return profiler.call(func, args, memoized_call)
+    return memoized_call(func, args)
+
+def metered_call(func: object_.Object, args: list[object_.Object]) -> object_.Object:
+    b = meter
+    b.depth += 1
+    if b.depth > b.peak_depth:
+        if b.depth > b.depth_cap: raise budget_.depth_exhausted(b)
+        b.peak_depth = b.depth
+    try:
+        if profiler.enabled: return profiler.call(func, args, memoized_call)
+        return memoized_call(func, args)
+    finally:
+        b.depth -= 1
+
+def memoized_call(func: object_.Object, args: list[object_.Object]) -> object_.Object:
+    if memo.enabled and isinstance(func, object_.Function): return memo.call(func, args, call_function)
+    return call_function(func, args)
+
+def call_function(func: object_.Object, args: list[object_.Object]) -> object_.Object:
+    while isinstance(func, object_.Function):
+        if jit.enabled:
+            res = jit.call(func, args)
+            if res is not None: return res
         if len(func.Params) != len(args): return new_error(f'len of args dont match len of parameters: {len(args)} != {len(func.Params)}')
-        for p, a in zip(func.Params, args): new_env.set_(p.Value, a)
-        evaluated = eval_(func.Body, new_env)
+        if func.scope is not None and func.compiled is None:
+            slots = list(args)
+            if func.scope.size > len(slots): slots.extend([None] * (func.scope.size - len(slots)))
+            evaluated = eval_(func.Body, object_.Frame(slots, func.scope.names, func.env))
+        else:
+            new_env = object_.Environment(func.env)
+            for p, a in zip(func.Params, args): new_env.set_(p.Value, a)
+            evaluated = func.compiled(new_env) if func.compiled is not None else eval_(func.Body, new_env)
         if isinstance(evaluated, object_.ReturnValue): evaluated = evaluated.Value
-        return evaluated
+        if not isinstance(evaluated, object_.TailCall): return evaluated
+        # the body ended in a call: run it here instead of one python frame deeper
+        func, args = evaluated.func, evaluated.args
+        if profiler.enabled: profiler.tail(func)
 
-    elif isinstance(func, object_.BuiltIn): return func.func(args)
+    if isinstance(func, object_.BuiltIn): return func.func(args)
 
     return new_error(f"not a function: {func.Type()}")
 
@@ -198,19 +274,22 @@ def evaluate_index_expression(node, env):
 
     right = eval_(node.Right, env)
     if isinstance(right, object_.Error): return right
+    return evaluate_index(left, right)
+
+def evaluate_index(left: object_.Object, right: object_.Object) -> object_.Object:
     if left.Type() == object_.ARRAY_OBJ:
         if not isinstance(right, object_.Integer): return new_error(f'right is not integer, got {right.Type()}')
-        if right.Value >= len(left.Elements): return new_error(f'array index {right.Value} out of range for array of len {len(left.Elements)}')
+        if right.Value >= len(left): return new_error(f'array index {right.Value} out of range for array of len {len(left)}')
         if right.Value < 0: return new_error(f'we do not support negative indexing; got {right.Value}')
-        return left.Elements[right.Value]
+        return left[right.Value]
 
     elif left.Type() == object_.HASH_OBJ:
         if right.Type() not in (object_.STRING_OBJ, object_.BOOLEAN_OBJ, object_.INTEGER_OBJ):
             return new_error(f'key type should be one of STRING, BOOLEAN or INTEGER. got={right.Type()}')
 
-        if right not in left.Elements.keys():
-            return new_error(f'key not found')
-        return left.Elements[right]
+        res = left.get(right)
+        if res is None: return new_error(f'key not found')
+        return res
 
 def evaluate_pairs(Elements, env):
     result = {}
@@ -219,6 +298,71 @@ def evaluate_pairs(Elements, env):
         if Key.Type() not in (object_.STRING_OBJ, object_.BOOLEAN_OBJ, object_.INTEGER_OBJ):
             return new_error(f'key type should be one of STRING, BOOLEAN or INTEGER. got={Key.Type()}')
         Value = eval_(node[1], env)
-        result[Key] = Value
+        result[Key.HashKey()] = (Key, Value)
 
     return result
+
+
+# ===
+# Budgets
+# ===
+# The budget's counters are reset and it is made the meter for the whole evaluation. Running out
+# unwinds with budget_.Exhausted, which becomes an Error here; so does a RecursionError, should
+# Python's own stack run out before the depth budget does, which the recursion limit, raised for
+# the run to fit max_depth calls, should prevent. Native code from the jit would run unmetered,
+# so the jit is off while a budget is in force.
+
+def evaluate_budgeted(node: ast.Node, env: object_.Environment, budget: budget_.Budget) -> object_.Object:
+    global meter
+    outer, jitted, limit = meter, jit.enabled, sys.getrecursionlimit()
+    budget.reset()
+    meter, jit.enabled = budget, False
+    if budget.max_depth is not None: sys.setrecursionlimit(max(limit, budget_.recursion_limit(budget)))
+    try:
+        with budget_.charging(budget): return eval_(node, env)
+    except budget_.Exhausted as e:
+        return new_error(str(e))
+    except RecursionError:
+        return new_error(f'call depth budget exhausted: python recursion limit reached at depth {budget.peak_depth}')
+    finally:
+        meter, jit.enabled = outer, jitted
+        sys.setrecursionlimit(limit)
+
+
+# ===
+# Tail calls
+# ===
+# A call is in tail position when its value becomes the function's value unchanged: the operand
+# of a return that is itself a statement of the body, or of a branch of an if used as one, or the
+# last expression of the body (through if/else branches). A return inside an if used as a value
+# (say, a let's) only hands its ReturnValue to that let, so its operand has to be called there.
+# Every call's flag is recomputed on each pass, so a subtree that incremental.reparse carried
+# over into a new position gets the marks of where it is now.
+
+def mark_tail_calls(node, tails: set[int] = frozenset()) -> None:
+    if isinstance(node, ast.CallExpression): node.Tail = id(node) in tails
+    elif isinstance(node, ast.FunctionLiteral):
+        tails = set()
+        mark_tail_block(node.Body, tails)
+        mark_statement_returns(node.Body, tails)
+    for child in ast.children(node): mark_tail_calls(child, tails)
+
+def mark_tail_block(block: ast.BlockStatement | None, tails: set[int]) -> None:
+    if block is None or len(block.Statements) == 0: return
+    last = block.Statements[-1]
+    if isinstance(last, ast.ExpressionStatement): mark_tail_expression(last.Expression_, tails)
+    elif isinstance(last, ast.ReturnStatement): mark_tail_expression(last.Value, tails)
+
+def mark_tail_expression(node, tails: set[int]) -> None:
+    if isinstance(node, ast.CallExpression): tails.add(id(node))
+    elif isinstance(node, ast.IFExpression):
+        mark_tail_block(node.Consequence, tails)
+        mark_tail_block(node.Alternative, tails)
+
+def mark_statement_returns(block: ast.BlockStatement | None, tails: set[int]) -> None:
+    if block is None: return
+    for stmt in block.Statements:
+        if isinstance(stmt, ast.ReturnStatement): mark_tail_expression(stmt.Value, tails)
+        elif isinstance(stmt, ast.ExpressionStatement) and isinstance(stmt.Expression_, ast.IFExpression):
+            mark_statement_returns(stmt.Expression_.Consequence, tails)
+            mark_statement_returns(stmt.Expression_.Alternative, tails)
@@ -0,0 +1,144 @@
+# Persistent hash array mapped trie, the representation object_.Hash switches to once set() or
+# delete() start making new versions of it: an update copies only the path to the changed
+# entry, every other node is shared with the version it was made from.
+#
+# Each level consumes BITS bits of the key's hash; a Node keeps a bitmap of occupied slots and a
+# tuple holding just those, each either a leaf (key, value, seq) or a deeper node. Keys that
+# agree on all 64 bits end up together in a Collision. Keys are any hashable values (here,
+# object_.HashKey tuples). seq numbers insertions so that items() can come back in insertion order,
+# as a dict's would; replacing a key's value keeps its place.
+
+BITS = 5
+MASK = (1 << BITS) - 1
+HASH_BITS = 64
+HASH_MASK = (1 << HASH_BITS) - 1
+
+
+class Node:
+    __slots__ = ('bitmap', 'children')
+
+    def __init__(self, bitmap: int, children: tuple):
+        self.bitmap = bitmap
+        self.children = children
+
+
+class Collision:
+    __slots__ = ('children',)
+
+    def __init__(self, children: tuple):
+        self.children = children  # leaves whose keys hash alike in all HASH_BITS bits
+
+
+EMPTY = Node(0, ())
+
+
+class Map:
+    __slots__ = ('root', 'size', 'next')
+
+    def __init__(self, root: Node = EMPTY, size: int = 0, next: int = 0):
+        self.root = root
+        self.size = size
+        self.next = next  # seq of the next new key
+
+    @classmethod
+    def from_items(cls, items) -> "Map":
+        m = cls()
+        for k, v in items: m = m.assoc(k, v)
+        return m
+
+    def __len__(self) -> int: return self.size
+
+    def get(self, key, default=None):
+        leaf = find(self.root, key, hash(key) & HASH_MASK)
+        return default if leaf is None else leaf[1]
+
+    def assoc(self, key, value) -> "Map":
+        h = hash(key) & HASH_MASK
+        old = find(self.root, key, h)
+        if old is None: return Map(assoc(self.root, 0, h, (key, value, self.next)), self.size + 1, self.next + 1)
+        return Map(assoc(self.root, 0, h, (key, value, old[2])), self.size, self.next)
+
+    def dissoc(self, key) -> "Map":
+        root = dissoc(self.root, 0, hash(key) & HASH_MASK, key)
+        if root is self.root: return self
+        return Map(EMPTY if root is None else root, self.size - 1, self.next)
+
+    def items(self):
+        return [(leaf[0], leaf[1]) for leaf in sorted(leaves(self.root), key=lambda leaf: leaf[2])]
+
+    def values(self):
+        return [v for _, v in self.items()]
+
+
+# ===
+# Trie operations
+# ===
+
+def find(node, key, h: int) -> tuple | None:
+    shift = 0
+    while True:
+        if node.__class__ is Collision:
+            for leaf in node.children:
+                if leaf[0] == key: return leaf
+            return None
+        bit = 1 << ((h >> shift) & MASK)
+        if not node.bitmap & bit: return None
+        node = node.children[(node.bitmap & (bit - 1)).bit_count()]
+        if node.__class__ is tuple: return node if node[0] == key else None
+        shift += BITS
+
+def assoc(node, shift: int, h: int, leaf: tuple):
+    key = leaf[0]
+    if node.__class__ is Collision:
+        children = tuple([c for c in node.children if not c[0] == key])
+        return Collision(children + (leaf,))
+    bit = 1 << ((h >> shift) & MASK)
+    i = (node.bitmap & (bit - 1)).bit_count()
+    children = node.children
+    if not node.bitmap & bit: return Node(node.bitmap | bit, children[:i] + (leaf,) + children[i:])
+    child = children[i]
+    if child.__class__ is not tuple: child = assoc(child, shift + BITS, h, leaf)
+    elif child[0] == key: child = leaf
+    else: child = split(shift + BITS, child, leaf, h)
+    return Node(node.bitmap, children[:i] + (child,) + children[i + 1:])
+
+def split(shift: int, a: tuple, b: tuple, hb: int):
+    # the smallest subtree holding two leaves that shared a slot one level up
+    ha = hash(a[0]) & HASH_MASK
+    if shift >= HASH_BITS: return Collision((a, b))
+    sa, sb = (ha >> shift) & MASK, (hb >> shift) & MASK
+    if sa == sb: return Node(1 << sa, (split(shift + BITS, a, b, hb),))
+    return Node((1 << sa) | (1 << sb), (a, b) if sa < sb else (b, a))
+
+def dissoc(node, shift: int, h: int, key):
+    # the node without key: node itself when key is absent, None when nothing is left, or a lone
+    # leaf for the parent to hold directly
+    if node.__class__ is Collision:
+        children = tuple([c for c in node.children if not c[0] == key])
+        if len(children) == len(node.children): return node
+        return children[0] if len(children) == 1 else Collision(children)
+    bit = 1 << ((h >> shift) & MASK)
+    if not node.bitmap & bit: return node
+    i = (node.bitmap & (bit - 1)).bit_count()
+    child = node.children[i]
+    if child.__class__ is tuple:
+        if not child[0] == key: return node
+        new = None
+    else:
+        new = dissoc(child, shift + BITS, h, key)
+        if new is child: return node
+    if new is None:
+        if node.bitmap == bit: return None
+        children = node.children[:i] + node.children[i + 1:]
+        if len(children) == 1 and children[0].__class__ is tuple and shift > 0: return children[0]
+        return Node(node.bitmap ^ bit, children)
+    if new.__class__ is tuple and len(node.children) == 1 and shift > 0: return new
+    return Node(node.bitmap, node.children[:i] + (new,) + node.children[i + 1:])
+
+def leaves(node):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        for child in node.children:
+            if child.__class__ is tuple: yield child
+            else: stack.append(child)
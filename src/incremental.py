@@ -0,0 +1,261 @@
+from typing import Callable, Iterator
+
+from . import ast, lexer, parser, token
+
+# Incremental reparsing for editors and the REPL. A Document keeps its ast.Program together with
+# each top-level statement's text and start, and where each of its block statements starts and
+# ends. An edit re-lexes and re-parses from the statement before the one it touches, and stops
+# as soon as the new parse reaches a statement boundary past the edit that was also a boundary
+# before it: from there on the text, and so the tokens and the parse, are the same as before.
+# Blocks in the re-parsed statements that the edit did not touch are taken over whole instead of
+# being parsed again (a block's parse depends only on the tokens between its braces). Statements
+# that come out with the same text as before keep their old node, so caches keyed by node
+# identity (jit, memo, profiler) stay warm.
+#
+# Nothing is done per edit for the rest of the document: the text is kept per statement and only
+# joined when asked for, and statement starts after the last edit are stored unshifted (entries
+# from shift_from on are off by shift), so only the entries between two consecutive edits get
+# fixed up.
+
+
+class Entry:
+    # One top-level statement, plus any failed parses that followed it (their errors); the head
+    # entry holds whatever comes before the first statement and has no statement.
+    __slots__ = ('start', 'text', 'stmt', 'blocks', 'errors')
+
+    def __init__(self, start: int, stmt: ast.Statement | None):
+        self.start = start
+        self.text = ''  # up to the next entry's start
+        self.stmt = stmt
+        self.blocks: list[tuple[int, int, ast.BlockStatement]] = []  # (start, end) relative to the entry
+        self.errors: list[str] = []
+
+
+class Change:
+    # Program.Statements[index:index+len(removed)] were replaced by added
+    __slots__ = ('index', 'removed', 'added')
+
+    def __init__(self, index: int, removed: list[ast.Statement], added: list[ast.Statement]):
+        self.index = index
+        self.removed = removed
+        self.added = added
+
+    def __repr__(self): return f'Change(index={self.index}, removed={len(self.removed)}, added={len(self.added)})'
+
+
+class Cursor(lexer.Scanner):
+    # The parser's token source: the document from base on, read from pieces as the tokens need
+    # it, with positions counted in the document. Keeps the spans of the parser's curr_token and
+    # peek_token; seek() jumps over a block taken from the previous parse.
+    __slots__ = ('buf', 'base', 'pos', 'pieces', 'eof', 'make', 'curr', 'peek')
+
+    def __init__(self, pieces: Iterator[str], base: int):
+        self.buf = ''
+        self.base = base
+        self.pos = base
+        self.pieces = pieces
+        self.eof = False
+        self.make = lexer.token_cache()
+        self.curr = self.peek = (base, base)
+
+    def next_token(self) -> token.Token:
+        while True:
+            i = self.pos - self.base
+            if i < len(self.buf):
+                tok, end = lexer.scan_token(self.buf, i, self.make, self.eof)
+                if end >= 0:
+                    self.pos = self.base + end
+                    if tok is None: continue
+                    self.curr, self.peek = self.peek, (self.base + i, self.pos)
+                    return tok
+            if self.eof: break
+            self.read()
+        self.curr, self.peek = self.peek, (self.pos, self.pos)
+        return self.make(token.EOF, '')
+
+    def read(self) -> None:
+        # at least as much again as is buffered, so a long token is not rescanned once per piece
+        parts, n = [], 0
+        for piece in self.pieces:
+            parts.append(piece)
+            n += len(piece)
+            if n > len(self.buf): break
+        else: self.eof = True
+        self.buf += ''.join(parts)
+
+    def text(self, start: int, end: int) -> str:
+        return self.buf[start - self.base:end - self.base]
+
+    def seek(self, end: int) -> None:
+        # continue after the '}' ending at end, as if it had just been read
+        self.pos = end
+        self.peek = (end - 1, end)
+
+
+class Parser(parser.Parser):
+    # records every block it parses as (start, end, block), and asks reusable(start) for a block
+    # from the previous parse, as (block, end, nested records relative to the block)
+    def __init__(self, l: Cursor, reusable: Callable[[int], tuple | None] | None, records: list):
+        self.reusable = reusable
+        self.records = records
+        super().__init__(l)
+
+    def parse_block_statements(self) -> ast.Statement:
+        cursor = self.l
+        start = cursor.curr[0]
+        found = self.reusable(start) if self.reusable else None
+        if found is not None:
+            block, end, nested = found
+            cursor.seek(end)
+            self.curr_token = cursor.make(token.RBRACE, '}')
+            self.peek_token = cursor.next_token()
+            self.records.extend([(start + s, start + e, b) for s, e, b in nested])
+            return block
+        block = super().parse_block_statements()
+        if self.is_curr_token_type(token.RBRACE): self.records.append((start, cursor.curr[1], block))
+        return block
+
+
+class Document:
+    def __init__(self, text: str):
+        self.length = len(text)
+        self.entries: list[Entry] = []
+        self.shift_from = 0  # entries from here on are off by shift
+        self.shift = 0
+        head, entries, _ = self.parse(iter([text]), 0, None, None)
+        self.entries = [head, *entries]
+        self.program = ast.Program(Statements=[e.stmt for e in entries])
+
+    @property
+    def text(self) -> str:
+        return ''.join([e.text for e in self.entries])
+
+    @property
+    def errors(self) -> list[str]:
+        return [err for e in self.entries for err in e.errors]
+
+    def start_of(self, i: int) -> int:
+        if i >= len(self.entries): return self.length
+        return self.entries[i].start + (self.shift if i >= self.shift_from else 0)
+
+    def entry_at(self, pos: int) -> int:
+        # the last entry starting at or before pos
+        lo, hi = 0, len(self.entries) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.start_of(mid) <= pos: lo = mid
+            else: hi = mid - 1
+        return lo
+
+    def edit(self, start: int, end: int, text: str) -> Change:
+        # replace the document's text from start to end with text
+        if not 0 <= start <= end <= self.length: raise ValueError(f'edit {start}:{end} is outside the document (length {self.length})')
+        entries, delta, new_end = self.entries, len(text) - (end - start), start + len(text)
+
+        # a token ending right at the edit may grow into it, and a statement may be continued by
+        # the first token of the next, so parsing restarts a statement before the one touched
+        r = max(self.entry_at(start - 1) - 1, 0)
+        last = self.entry_at(end)  # the entry the edit ends in
+        k = r + 1  # the next old entry the new parse may fall back in step with
+
+        def pieces(r: int) -> Iterator[str]:
+            # the new text from entries[r] on
+            old = ''.join([e.text for e in entries[r:last + 1]])
+            base = self.start_of(r)
+            yield old[:start - base] + text + old[end - base:]
+            for i in range(last + 1, len(entries)): yield entries[i].text
+
+        def synced(at: int) -> bool:
+            nonlocal k
+            while k < len(entries) and self.start_of(k) + delta < at: k += 1
+            return at >= new_end and k < len(entries) and self.start_of(k) + delta == at
+
+        offered: dict[int, tuple] = {}
+        taken: set[int] = set()
+        def reusable(at: int) -> tuple | None:
+            # the old block starting at new position at, if the edit left it alone
+            if at < start: old = at
+            elif at >= new_end: old = at - delta
+            else: return None
+            i = self.entry_at(old)
+            if i not in taken:
+                taken.add(i)
+                base, blocks = self.start_of(i), entries[i].blocks
+                for s, e, b in blocks:
+                    if base + e <= start or base + s >= end:
+                        nested = [(s2 - s, e2 - s, b2) for s2, e2, b2 in blocks if s <= s2 and e2 <= e]
+                        offered[base + s] = (b, base + e + (delta if base + s >= end else 0), nested)
+            return offered.get(old)
+
+        while True:
+            head, new, done = self.parse(pieces(r), self.start_of(r), reusable, synced)
+            if r == 0 or not head.errors: break
+            # the restart point no longer begins a statement: its failures belong to the one before
+            r, k = r - 1, r
+        if not done: k = len(entries)
+        if r == 0: new.insert(0, head)
+
+        # statements whose text did not change keep their old node and blocks (not their errors,
+        # which can name the token after them)
+        old = entries[r:k]
+        def same(n: Entry, o: Entry) -> bool:
+            return (n.stmt is None) == (o.stmt is None) and n.text == o.text
+        lo, hi = 0, 0
+        while lo < min(len(new), len(old)) and same(new[lo], old[lo]): lo += 1
+        while hi < min(len(new), len(old)) - lo and same(new[-1 - hi], old[-1 - hi]): hi += 1
+        for a, b in [(i, i) for i in range(lo)] + [(len(new) - 1 - i, len(old) - 1 - i) for i in range(hi)]:
+            new[a].stmt, new[a].blocks = old[b].stmt, old[b].blocks
+
+        self.relocate(r, k, len(new), delta)
+        entries[r:k] = new
+        self.length += delta
+
+        first = max(r - 1, 0)  # Program.Statements index of entries[r], or of entries[1] for the head
+        removed = [e.stmt for e in old if e.stmt is not None]
+        added = [e.stmt for e in new if e.stmt is not None]
+        self.program.Statements[first:first + len(removed)] = added
+        skip = lo - (r == 0 and lo > 0)
+        return Change(first + skip, removed[skip:len(removed) - hi], added[skip:len(added) - hi])
+
+    def relocate(self, r: int, k: int, n: int, delta: int) -> None:
+        # entries[r:k] are about to be replaced by n entries with exact starts, and the ones from k
+        # on move by delta; fix up the entries between this edit and the last so that a single
+        # pending shift is left
+        entries, shift = self.entries, self.shift
+        if shift and self.shift_from < r:
+            for i in range(self.shift_from, r): entries[i].start += shift
+        elif shift:
+            for i in range(k, self.shift_from): entries[i].start -= shift
+        self.shift_from = r + n
+        self.shift += delta
+
+    def parse(self, pieces: Iterator[str], pos: int, reusable, synced) -> tuple[Entry, list[Entry], bool]:
+        # Parser.parse_program over the text from pos on, one Entry per statement, until EOF or
+        # until synced() says the parse is back in step with the previous one at the next
+        # statement (the returned flag). Failures before the first statement go to the head entry.
+        cursor = Cursor(pieces, pos)
+        p = Parser(l=cursor, reusable=reusable, records=[])
+        head = Entry(pos, None)
+        entries: list[Entry] = []
+        done = False
+        while not p.is_curr_token_type(token.EOF):
+            at = cursor.curr[0]
+            if entries and synced is not None and synced(at):
+                done = True
+                break
+            records, errors = len(p.records), len(p.errors)
+            statement = None
+            try:
+                statement = p.parse_statement()
+            except Exception as e:
+                p.errors.append(str(e))
+            finally:
+                p.next_token()
+            if statement is not None:
+                entry = Entry(at, statement)
+                entry.blocks = [(s - at, e - at, b) for s, e, b in p.records[records:]]
+                entries.append(entry)
+            (entries[-1] if entries else head).errors.extend(p.errors[errors:])
+        stop = at if done else cursor.pos
+        for entry, end in zip([head, *entries], [e.start for e in entries] + [stop]): entry.text = cursor.text(entry.start, end)
+        return head, entries, done
@@ -0,0 +1,264 @@
+from typing import Callable
+
+from . import ast, object_, evaluator
+
+# Tiered JIT for the tree walker. apply_function counts calls per Function; once a function
+# crosses THRESHOLD its body is translated to Python source over native ints/bools and
+# compile()d. Only pure integer code is accepted (params, lets, arithmetic, comparisons, ifs,
+# returns and self-recursive calls), so when a guard fails at runtime the whole call can
+# simply be re-run by the tree walker without observable difference.
+
+enabled = False
+THRESHOLD = 50
+
+INT = 'int'
+BOOL = 'bool'
+
+
+class Unsupported(Exception): pass   # translation-time: function stays on the tree walker
+class GuardFailed(Exception): pass   # entry guard: this call goes to the tree walker
+class Deopt(Exception): pass         # mid-body: function goes back to the tree walker for good
+
+
+class Entry:
+    def __init__(self, body: ast.BlockStatement, native: Callable | None, kind: str | None, reason: str | None):
+        self.body = body  # keeps the id() key alive
+        self.native = native
+        self.kind = kind
+        self.reason = reason
+        self.hits = 0
+
+# id(FunctionLiteral.Body) -> Entry; functions created from the same literal share translations
+cache: dict[int, Entry] = {}
+fallbacks: list[tuple[str, str]] = []
+
+
+def describe(func: object_.Function) -> str:
+    body = str(func.Body).replace('\n', ' ')
+    if len(body) > 40: body = body[:37] + '...'
+    return f'fn({", ".join([p.Value for p in func.Params])}) {{ {body} }}'
+
+def call(func: object_.Function, args: list[object_.Object]) -> object_.Object | None:
+    # returns None when the tree walker should handle this call
+    entry = cache.get(id(func.Body), None)
+    if entry is None:
+        func.calls += 1
+        if func.calls < THRESHOLD: return None
+        entry = cache[id(func.Body)] = translate(func)
+        if entry.native is None: fallbacks.append((describe(func), entry.reason))
+
+    native = entry.native
+    if native is None or len(args) != len(func.Params): return None
+    Integer = object_.Integer
+    for a in args:
+        if a.__class__ is not Integer: return None
+
+    try:
+        res = native(func.env, *[a.Value for a in args])
+    except GuardFailed:
+        return None
+    except (Deopt, NameError, RecursionError) as e:
+        # native code recurses on the python stack; deep (tail) recursion is left to the trampoline
+        entry.native = None
+        entry.reason = f'deoptimized: {e}'
+        fallbacks.append((describe(func), entry.reason))
+        return None
+
+    entry.hits += 1
+    if entry.kind == BOOL: return evaluator.TRUE if res else evaluator.FALSE
+    return Integer(res)
+
+def report() -> str:
+    compiled = [e for e in cache.values() if e.native is not None]
+    lines = [f'jit: {len(compiled)} compiled, {len(fallbacks)} fell back to the tree walker']
+    for e in compiled: lines.append(f'  compiled  {e.hits:>8} native calls  {str(e.body)[:50]!r}')
+    for desc, reason in fallbacks: lines.append(f'  fallback  {desc}: {reason}')
+    return '\n'.join(lines)
+
+def reset() -> None:
+    cache.clear()
+    fallbacks.clear()
+
+
+# ===
+# Runtime helpers used by generated code
+# ===
+
+def _lookup(env: object_.Environment, name: str) -> object_.Object:
+    val = env.get(name)
+    if val is None: raise GuardFailed(f'identifier not found: {name}')
+    return val
+
+def _captured_int(env: object_.Environment, name: str) -> int:
+    val = _lookup(env, name)
+    if val.__class__ is not object_.Integer: raise GuardFailed(f'{name} is not an integer')
+    return val.Value
+
+def _self_env(env: object_.Environment, name: str, body: ast.BlockStatement) -> object_.Environment:
+    val = _lookup(env, name)
+    if val.__class__ is not object_.Function or val.Body is not body: raise Deopt(f'call to {name} is not self-recursive')
+    return val.env
+
+
+# ===
+# Translator
+# ===
+
+class Translator:
+    def __init__(self, func: object_.Function, self_kind: str):
+        self.func = func
+        self.body = func.Body
+        self.self_kind = self_kind
+        self.params = [p.Value for p in func.Params]
+        self.kinds: dict[str, str] = {p: INT for p in self.params}
+        self.lets = collect_lets(func.Body)
+        self.captured: set[str] = set()
+        self.self_names: set[str] = set()
+        self.return_kinds: set[str] = set()
+        self.lines: list[str] = []
+
+    def emit(self, line: str, depth: int) -> None:
+        self.lines.append('    ' * depth + line)
+
+    def source(self) -> str:
+        self.block(self.body.Statements, tail=True, depth=1)
+        prologue = []
+        for name in sorted(self.captured): prologue.append(f'    v_{name} = _captured_int(env, {name!r})')
+        for name in sorted(self.self_names): prologue.append(f'    e_{name} = _self_env(env, {name!r}, BODY)')
+        head = f"def native(env{''.join([', v_' + p for p in self.params])}):"
+        return '\n'.join([head] + prologue + self.lines) + '\n'
+
+    def block(self, stmts: list[ast.Statement], tail: bool, depth: int) -> None:
+        if len(stmts) == 0:
+            if tail: raise Unsupported('block evaluates to null')
+            self.emit('pass', depth)
+            return
+        for i, stmt in enumerate(stmts):
+            last = i == len(stmts) - 1
+            if isinstance(stmt, ast.ReturnStatement):
+                if stmt.Value is None: raise Unsupported('bare return')
+                src, kind = self.expr(stmt.Value)
+                self.return_kinds.add(kind)
+                self.emit(f'return {src}', depth)
+                return  # the rest is unreachable
+
+            if isinstance(stmt, ast.LetStatement):
+                if tail and last: raise Unsupported('block evaluates to null')
+                name = stmt.Name.Value
+                src, kind = self.expr(stmt.Value)
+                if self.kinds.get(name, kind) != kind: raise Unsupported(f'{name} changes type')
+                self.kinds[name] = kind
+                self.emit(f'v_{name} = {src}', depth)
+                continue
+
+            if isinstance(stmt, ast.ExpressionStatement) and isinstance(stmt.Expression_, ast.IFExpression):
+                self.if_statement(stmt.Expression_, tail and last, depth)
+                continue
+
+            if not isinstance(stmt, ast.ExpressionStatement) or stmt.Expression_ is None:
+                raise Unsupported(f'statement {stmt}')
+            src, kind = self.expr(stmt.Expression_)
+            if tail and last:
+                self.return_kinds.add(kind)
+                self.emit(f'return {src}', depth)
+            else: self.emit(src, depth)
+
+    def if_statement(self, node: ast.IFExpression, tail: bool, depth: int) -> None:
+        cond, _ = self.expr(node.Condition)
+        self.emit(f'if {cond}:', depth)
+        self.block(node.Consequence.Statements, tail, depth + 1)
+        if node.Alternative is None:
+            if tail: raise Unsupported('if without else evaluates to null')
+            return
+        self.emit('else:', depth)
+        self.block(node.Alternative.Statements, tail, depth + 1)
+
+    def expr(self, node: ast.Expression) -> tuple[str, str]:
+        if isinstance(node, ast.IntegerLiteral): return str(node.Value), INT
+        if isinstance(node, ast.Boolean): return ('True' if node.Value else 'False'), BOOL
+
+        if isinstance(node, ast.Identifier):
+            name = node.Value
+            if name in self.kinds: return f'v_{name}', self.kinds[name]
+            if name in self.lets: raise Unsupported(f'{name} used before its let')
+            self.captured.add(name)
+            self.kinds[name] = INT
+            return f'v_{name}', INT
+
+        if isinstance(node, ast.PrefixExpression):
+            src, kind = self.expr(node.Right)
+            if node.Operator == '-' and kind == INT: return f'(-{src})', INT
+            if node.Operator == '!' and kind == INT: return f'({src} == 0)', BOOL
+            if node.Operator == '!' and kind == BOOL: return f'(not {src})', BOOL
+            raise Unsupported(f'prefix {node.Operator} on {kind}')
+
+        if isinstance(node, ast.InfixExpression):
+            left, lkind = self.expr(node.Left)
+            right, rkind = self.expr(node.Right)
+            op = node.Operator
+            if lkind == rkind and op in ('==', '!='): return f'({left} {op} {right})', BOOL
+            if lkind == INT and rkind == INT:
+                if op in ('+', '-', '*'): return f'({left} {op} {right})', INT
+                if op in ('<', '>'): return f'({left} {op} {right})', BOOL
+            raise Unsupported(f'{lkind} {op} {rkind}')
+
+        if isinstance(node, ast.IFExpression):
+            # only the plain conditional-expression shape is allowed in expression position
+            if node.Alternative is None: raise Unsupported('if without else evaluates to null')
+            cons = single_expression(node.Consequence)
+            alt = single_expression(node.Alternative)
+            cond, _ = self.expr(node.Condition)
+            csrc, ckind = self.expr(cons)
+            asrc, akind = self.expr(alt)
+            if ckind != akind: raise Unsupported('if branches differ in type')
+            return f'({csrc} if {cond} else {asrc})', ckind
+
+        if isinstance(node, ast.CallExpression):
+            fn = node.Function
+            if not isinstance(fn, ast.Identifier) or fn.Value in self.kinds or fn.Value in self.lets:
+                raise Unsupported(f'call to {fn}')
+            if len(node.Arguments) != len(self.params): raise Unsupported(f'call to {fn} is not self-recursive')
+            args = []
+            for a in node.Arguments:
+                src, kind = self.expr(a)
+                if kind != INT: raise Unsupported(f'non-integer argument to {fn}')
+                args.append(src)
+            self.self_names.add(fn.Value)
+            return f"native(e_{fn.Value}{''.join([', ' + a for a in args])})", self.self_kind
+
+        raise Unsupported(f'{type(node).__name__} {node}')
+
+
+def single_expression(block: ast.BlockStatement) -> ast.Expression:
+    if len(block.Statements) != 1 or not isinstance(block.Statements[0], ast.ExpressionStatement):
+        raise Unsupported('if branch is not a single expression')
+    return block.Statements[0].Expression_
+
+def collect_lets(node) -> set[str]:
+    names = set()
+    if isinstance(node, ast.LetStatement): names.add(node.Name.Value)
+    if isinstance(node, ast.BlockStatement):
+        for s in node.Statements: names |= collect_lets(s)
+    if isinstance(node, ast.ExpressionStatement) and isinstance(node.Expression_, ast.IFExpression):
+        names |= collect_lets(node.Expression_.Consequence)
+        names |= collect_lets(node.Expression_.Alternative)
+    return names
+
+def translate(func: object_.Function) -> Entry:
+    reason = None
+    for self_kind in (INT, BOOL):
+        try:
+            t = Translator(func, self_kind)
+            src = t.source()
+        except Unsupported as e:
+            reason = str(e)
+            continue
+        kinds = t.return_kinds
+        if len(kinds) != 1 or (t.self_names and kinds != {self_kind}):
+            reason = 'return type is not a single int or bool'
+            continue
+
+        namespace = {'BODY': func.Body, '_captured_int': _captured_int, '_self_env': _self_env}
+        exec(compile(src, f'<jit {describe(func)}>', 'exec'), namespace)
+        return Entry(func.Body, namespace['native'], kinds.pop(), None)
+    return Entry(func.Body, None, None, reason)
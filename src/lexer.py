@@ -1,18 +1,19 @@
-from pydantic import BaseModel, field_validator
+import codecs
+import mmap
+import re
+from typing import BinaryIO, Callable, Iterator, TextIO
+
 from . import token
 
-class Lexer(BaseModel):
-    inp: str
-    pos: int = 0
-    read_pos: int = 0
-    ch: str | None = None  # but has to be of len 1
+class Lexer:
+    __slots__ = ('inp', 'pos', 'read_pos', 'ch')
 
-    @field_validator('ch')
-    def check_ch_length(cls, value):
-        if value is None: return value
-        if len(value) != 1:
-            raise ValueError('ch must be a single character')
-        return value
+    def __init__(self, inp: str, pos: int = 0, read_pos: int = 0, ch: str | None = None):
+        if ch is not None and len(ch) != 1: raise ValueError('ch must be a single character')
+        self.inp = inp
+        self.pos = pos
+        self.read_pos = read_pos
+        self.ch = ch  # the character at pos, None past the end
 
 def read_char(l: Lexer):
     if l.read_pos >= len(l.inp): l.ch = None
@@ -148,3 +149,159 @@ def get_escape_char(ch):
     if ch == 't': return '  '
     if ch == 'n': return '\n'
     return ch
+
+
+# ===
+# Scanner: same tokens as next_token, driven by one master regex instead of per-char reads
+# ===
+
+MASTER_RE = re.compile(r'([ \t\n\r]+)|([^\W\d_]+)|(\d+)|(==|!=|[=+,;:(){}\[\]\-*/<>!])|(")')
+_WS, _IDENT, _INT, _SPECIAL, _QUOTE = 1, 2, 3, 4, 5
+
+SPECIAL_TOKENS_DICT = {**SPECIAL_CHARS_DICT, '==': token.EQ, '!=': token.NOT_EQ}
+ESCAPE_CHARS_DICT = {'t': '  ', 'n': '\n'}
+CHUNK_SIZE = 1 << 16  # stream_tokens' read size
+
+def tokenize(inp: str) -> Iterator[token.Token]:
+    make = token_cache()
+    n = len(inp)
+    pos = 0
+    while pos < n:
+        tok, pos = scan_token(inp, pos, make, True)
+        if tok is not None: yield tok
+    yield make(token.EOF, '')
+
+def token_cache(limit: int = 1 << 14) -> Callable[[str, str], token.Token]:
+    # tokens are never mutated, so one instance per distinct (type, literal) is shared across a
+    # scan; bounded, so that streaming a huge file of distinct literals does not grow it forever
+    cache: dict[tuple[str, str], token.Token] = {}
+    Token = token.Token
+    def make(type_, literal):
+        tok = cache.get((type_, literal), None)
+        if tok is None:
+            tok = Token(type_, literal)
+            if len(cache) < limit: cache[(type_, literal)] = tok
+        return tok
+    return make
+
+def scan_token(inp: str, pos: int, make: Callable[[str, str], token.Token], final: bool) -> tuple[token.Token | None, int]:
+    # One token starting at pos, and the position after it; None for a run of whitespace.
+    # Unless final, a token that reaches the end of inp might continue past it, so the
+    # position comes back as -1 and the caller should retry with more input.
+    m = MASTER_RE.match(inp, pos)
+    if m is None: return make(token.ILLEGAL, inp[pos]), pos + 1
+
+    kind = m.lastindex
+    if not final and m.end() == len(inp) and kind != _QUOTE: return None, -1
+    lit = m.group(kind)
+    if kind == _WS: return None, m.end()
+    if kind == _IDENT:
+        if not lit.isascii():
+            # the class also admits non-alpha numerics (e.g. '²'); read_identifier stops at those
+            end = 0
+            while end < len(lit) and lit[end].isalpha(): end += 1
+            if end == 0: return make(token.ILLEGAL, lit[0]), pos + 1
+            lit = lit[:end]
+        return make(KEYWORDS_DICT.get(lit, token.IDENT), lit), pos + len(lit)
+    if kind == _INT: return make(token.INT, lit), m.end()
+    if kind == _SPECIAL: return make(SPECIAL_TOKENS_DICT[lit], lit), m.end()
+
+    s, end = scan_string(inp, pos)
+    if s is not None: return token.Token(token.STRING, s), end
+    if not final: return None, -1
+    return make(token.ILLEGAL, 'string end not found'), end
+
+def scan_string(inp: str, pos: int) -> tuple[str | None, int]:
+    # Mirrors read_string exactly, including that the first char of the string and the
+    # char right after an escape are only ever checked for a closing quote, not for '\\'.
+    n = len(inp)
+    parts = []
+    start = pos + 1
+    seg = start
+    while True:
+        if seg >= n: return None, n
+        if inp[seg] == '"':
+            parts.append(inp[start:seg])
+            return ''.join(parts), seg + 1
+        q = inp.find('"', seg + 1)
+        b = inp.find('\\', seg + 1, q if q != -1 else n)
+        if b == -1:
+            if q == -1: return None, n
+            parts.append(inp[start:q])
+            return ''.join(parts), q + 1
+        if b + 1 >= n: return None, n
+        parts.append(inp[start:b])
+        esc = inp[b+1]
+        parts.append(ESCAPE_CHARS_DICT.get(esc, esc))
+        start = seg = b + 2
+
+class Scanner:
+    # drop-in for Lexer as the parser's token source
+    __slots__ = ('inp', '_tokens', '_eof')
+
+    def __init__(self, inp: str):
+        self.inp = inp
+        self._tokens = tokenize(inp)
+        self._eof = None
+
+    def next_token(self) -> token.Token:
+        if self._eof is not None: return self._eof
+        tok = next(self._tokens)
+        if tok.type_ == token.EOF: self._eof = tok
+        return tok
+
+    @classmethod
+    def from_stream(cls, source: "TextIO | BinaryIO | mmap.mmap", chunk_size: int = CHUNK_SIZE) -> "Scanner":
+        self = cls.__new__(cls)
+        self.inp = None
+        self._tokens = stream_tokens(source, chunk_size)
+        self._eof = None
+        return self
+
+
+# ===
+# Streaming: tokens from a file object or mmap, read in chunks
+# ===
+
+def stream_tokens(source: "TextIO | BinaryIO | mmap.mmap", chunk_size: int = CHUNK_SIZE) -> Iterator[token.Token]:
+    # Same tokens as tokenize(source.read()), holding only the unconsumed tail of the input.
+    # Bytes are decoded as utf-8, incrementally, so a character split across reads is fine.
+    # A token that reaches the end of what has been read so far (an identifier, a number, a
+    # string, '=' before a possible '=') is retried once more input is in; the read size grows
+    # with the pending tail so that a very long string is not rescanned once per chunk.
+    make = token_cache()
+    decoder = None
+    buf = ''
+    pos = 0
+    eof = False
+    while True:
+        if pos < len(buf):
+            tok, end = scan_token(buf, pos, make, eof)
+            if end >= 0:
+                pos = end
+                if tok is not None: yield tok
+                continue
+        if eof: break
+
+        data = source.read(max(chunk_size, len(buf) - pos))
+        if isinstance(data, (bytes, bytearray)):
+            if decoder is None: decoder = codecs.getincrementaldecoder('utf-8')()
+            text = decoder.decode(data, final=not data)
+        else: text = data
+        eof = not data
+        buf = buf[pos:] + text
+        pos = 0
+
+    yield make(token.EOF, '')
+
+def stream_file(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[token.Token]:
+    # maps the file when it can, so reads come straight from the page cache
+    with open(path, 'rb') as f:
+        try:
+            source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            source = f  # empty files cannot be mapped
+        try:
+            yield from stream_tokens(source, chunk_size)
+        finally:
+            if source is not f: source.close()
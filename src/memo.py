@@ -0,0 +1,172 @@
+from collections import OrderedDict
+from typing import Callable
+
+from . import ast, object_, jit, resolver
+from .builtins_ import builtins
+
+# Memoization of pure functions for the tree walker.
+#
+# Purity is decided in two steps. Statically, per function literal: every call in the body must
+# go to a name the body does not bind itself (a parameter or local could be any function) or to
+# a function literal, and the free names the body reads are collected. Then at run time, per
+# Function: each free name is looked up where the function would look it up, and must hold
+# either a plain value (Monkey values are immutable), a builtin other than puts, or a Function
+# that passes the same test. What those names held is recorded, transitively through callees,
+# and re-checked on every call; when a captured binding changes (a global redefined at the REPL)
+# the table is dropped and purity decided again.
+#
+# Tables are per Function and bounded to MAX_ENTRIES with LRU eviction. Keys are built from the
+# arguments' class and value, so Integer(1) and Boolean(True) (equal as object_ hash keys) stay
+# apart. Calls with array, hash or function arguments are not memoized.
+
+enabled = False
+MAX_ENTRIES = 1024
+
+IMPURE_BUILTINS = {'puts'}
+
+
+class Table:
+    def __init__(self, literal: "Analysis", captured: list[tuple[object, str, object]]):
+        self.literal = literal
+        self.captured = captured  # (env, name, value) this table's results depend on
+        self.entries: OrderedDict = OrderedDict()
+
+    def valid(self) -> bool:
+        for env, name, value in self.captured:
+            if lookup(env, name) is not value: return False
+        return True
+
+
+class Analysis:
+    # per function literal; also where hit/miss counts accumulate across its Functions
+    def __init__(self, func: object_.Function, free: list[str], reason: str | None):
+        self.body = func.Body  # keeps the id() key alive
+        self.desc = jit.describe(func)
+        self.free = free
+        self.reason = reason
+        self.runtime_reason: str | None = None  # why the last Function of this literal checked was impure
+        self.hits = self.misses = self.evictions = self.skipped = 0
+
+IMPURE = 'impure'
+
+# id(FunctionLiteral.Body) -> Analysis
+analyses: dict[int, Analysis] = {}
+
+
+def call(func: object_.Function, args: list[object_.Object], apply: Callable) -> object_.Object:
+    table = func.memo
+    if table is None or (table is not IMPURE and not table.valid()):
+        table = func.memo = new_table(func)
+    if table is IMPURE: return apply(func, args)
+    stats = table.literal
+    key = memo_key(args)
+    if key is None:
+        stats.skipped += 1
+        return apply(func, args)
+
+    res = table.entries.get(key, None)
+    if res is not None:
+        stats.hits += 1
+        table.entries.move_to_end(key)
+        return res
+
+    stats.misses += 1
+    res = apply(func, args)
+    table.entries[key] = res
+    if len(table.entries) > MAX_ENTRIES:
+        table.entries.popitem(last=False)
+        stats.evictions += 1
+    return res
+
+def memo_key(args: list[object_.Object]) -> tuple | None:
+    key = []
+    for a in args:
+        cls = a.__class__
+        if cls is object_.Integer or cls is object_.String or cls is object_.Boolean: key.append((cls, a.Value))
+        elif cls is object_.Null: key.append((cls, None))
+        else: return None
+    return tuple(key)
+
+def new_table(func: object_.Function) -> Table | str:
+    captured = []
+    if impurity(func, captured, set()) is not None: return IMPURE
+    return Table(analyze(func), captured)
+
+def impurity(func: object_.Function, captured: list, seen: set[int]) -> str | None:
+    if id(func) in seen: return None  # (mutual) recursion: pure unless something else says otherwise
+    seen.add(id(func))
+    a = analyze(func)
+    if a.reason is not None: return a.reason
+    for name in a.free:
+        val = lookup(func.env, name)
+        captured.append((func.env, name, val))
+        reason = None
+        if val.__class__ is object_.BuiltIn and name in IMPURE_BUILTINS: reason = f'calls {name}'
+        elif val.__class__ is object_.Function and impurity(val, captured, seen) is not None: reason = f'calls {name}, which is impure'
+        if reason is not None:
+            a.runtime_reason = reason
+            return reason
+    return None
+
+def lookup(env: object_.Environment | object_.Frame, name: str) -> object_.Object | None:
+    val = env.get(name)
+    return val if val is not None else builtins.get(name, None)
+
+
+# ===
+# Static analysis
+# ===
+
+def analyze(func: object_.Function) -> Analysis:
+    a = analyses.get(id(func.Body), None)
+    if a is None:
+        free: list[str] = []
+        reason = scan_function(func.Params, func.Body, set(), free)
+        a = analyses[id(func.Body)] = Analysis(func, free, reason)
+    return a
+
+def scan_function(params: list[ast.Identifier], body: ast.BlockStatement, outer: set[str], free: list[str]) -> str | None:
+    lets = set(resolver.let_names(body))
+    bound = outer | lets | {p.Value for p in params}
+    return scan(body, bound, lets, free)
+
+def scan(node: ast.Node | None, bound: set[str], lets: set[str], free: list[str]) -> str | None:
+    if node is None: return None
+
+    if isinstance(node, ast.Identifier):
+        # a let-bound name read before its let still sees the outer binding, so it counts as free too
+        if (node.Value not in bound or node.Value in lets) and node.Value not in free: free.append(node.Value)
+        return None
+
+    if isinstance(node, ast.FunctionLiteral):
+        return scan_function(node.Parameters, node.Body, bound, free)
+
+    if isinstance(node, ast.CallExpression):
+        fn = node.Function
+        if isinstance(fn, ast.Identifier) and fn.Value in bound: return f'calls {fn.Value}, which is a parameter or local'
+        if not isinstance(fn, (ast.Identifier, ast.FunctionLiteral)): return f'calls the result of {fn}'
+
+    for child in ast.children(node):
+        reason = scan(child, bound, lets, free)
+        if reason is not None: return reason
+    return None
+
+
+# ===
+# Reporting
+# ===
+
+def report() -> str:
+    lines = [f'memo: {MAX_ENTRIES} entries per function']
+    for a in analyses.values():
+        reason = a.reason if a.reason is not None or a.hits + a.misses + a.skipped else a.runtime_reason
+        if reason is not None:
+            lines.append(f'  impure    {a.desc}: {reason}')
+            continue
+        total = a.hits + a.misses
+        rate = f'{100 * a.hits / total:5.1f}%' if total else '    -'
+        lines.append(f'  memoized  {rate} hit rate  {a.hits:>8} hits {a.misses:>8} misses {a.evictions:>6} evicted {a.skipped:>6} unkeyable  {a.desc}')
+    return '\n'.join(lines)
+
+def reset() -> None:
+    analyses.clear()
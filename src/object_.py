@@ -1,6 +1,25 @@
+import array
 from abc import abstractmethod, ABC
-from typing import Callable
-from . import ast
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Iterator
+from . import ast, hamt
+
+
+# Identifier sites keep an inline cache of their last lookup (the value, or how many environments
+# out the name was found). Each name has a version cell, bumped whenever a binding such a cache
+# could have recorded is added or replaced; a site trusts its cache only while the version it
+# saw is still current, so a let that shadows a name invalidates every cached lookup of it.
+versions: dict[str, list[int]] = {}
+
+def version(name: str) -> list[int]:
+    cell = versions.get(name, None)
+    if cell is None: cell = versions[name] = [0]
+    return cell
+
+def rebound(name: str) -> None:
+    cell = versions.get(name, None)
+    if cell is not None: cell[0] += 1
 
 
 class Environment:
@@ -13,9 +32,30 @@ class Environment:
         return self.outer.get(k) if (ret is None and self.outer is not None) else ret
 
     def set_(self, k, v):
+        rebound(k)
         self.e[k] = v
 
 
+class Frame:
+    # fixed-size activation record for a function body laid out by resolver.Scope
+    __slots__ = ('slots', 'names', 'outer', 'globals_')
+
+    def __init__(self, slots: list, names: dict[str, int], outer: "Frame | Environment"):
+        self.slots = slots
+        self.names = names
+        self.outer = outer
+        self.globals_ = outer.globals_ if outer.__class__ is Frame else outer
+
+    # name-based access, for code that has not been resolved
+    def get(self, k):
+        i = self.names.get(k, None)
+        ret = self.slots[i] if i is not None else None
+        return self.outer.get(k) if ret is None else ret
+
+    def set_(self, k, v):
+        self.slots[self.names[k]] = v
+
+
 ObjectType = str
 
 class Object(ABC):
@@ -32,21 +72,37 @@ STRING_OBJ   = "STRING"
 ARRAY_OBJ    = "ARRAY"
 HASH_OBJ     = "HASH"
 RETURN_OBJ   = "RETURN_VALUE"
+TAIL_CALL_OBJ = "TAIL_CALL"
 ERROR_OBJ    = "ERROR"
 FUNCTION_OBJ = "FUNCTION"
 BUILTIN_OBJ  = "BUILTIN"
+COMPILED_FUNCTION_OBJ = "COMPILED_FUNCTION"
+
+# What a Hash is keyed by: the key's (type, value), made once per key object. Comparing the type
+# keeps 1 and true apart, and comparing values rather than hashes keeps colliding strings apart.
+HashKey = tuple[ObjectType, int | bool | str]
 
 class Integer(Object):
+    key = None  # HashKey, made on first use as a hash key
+
     def __init__(self, Value: int): self.Value = Value
     def __hash__(self): return self.Value
     def __eq__(self, value) -> bool: return hash(self) == hash(value)
+    def HashKey(self) -> HashKey:
+        if self.key is None: self.key = (INTEGER_OBJ, self.Value)
+        return self.key
     def Type(self): return INTEGER_OBJ
     def Inspect(self) -> str: return str(self.Value)
 
 class Boolean(Object):
+    key = None
+
     def __init__(self, Value: bool): self.Value = Value
     def __hash__(self): return self.Value
     def __eq__(self, value) -> bool: return hash(self) == hash(value)
+    def HashKey(self) -> HashKey:
+        if self.key is None: self.key = (BOOLEAN_OBJ, self.Value)
+        return self.key
     def Type(self): return BOOLEAN_OBJ
     def Inspect(self): return str(self.Value)
 
@@ -54,38 +110,160 @@ class Null(Object):
     def Type(self): return NULL_OBJ
     def Inspect(self) -> str: return "null"
 
+NULL = Null()
+TRUE = Boolean(True)
+FALSE = Boolean(False)
+
 class String(Object):
+    key = None
+
     def __init__(self, Value: str): self.Value = Value
     def __hash__(self): return hash(self.Value)
     def __eq__(self, value) -> bool: return hash(self) == hash(value)
+    def HashKey(self) -> HashKey:
+        if self.key is None: self.key = (STRING_OBJ, self.Value)
+        return self.key
+    def size(self) -> int: return len(self.Value)
     def Type(self): return STRING_OBJ
     def Inspect(self) -> str: return str(self.Value)
 
+class Rope(String):
+    # A concatenation that has not been looked at yet: it keeps both operands and joins them the
+    # first time its Value is read (hashing, comparison, Inspect, puts), so building a string
+    # piece by piece is linear. size() needs no flattening. Flattening walks the tree with an
+    # explicit stack, since accumulating ropes are as deep as they are long.
+    def __init__(self, left: String, right: String):
+        self.left = left
+        self.right = right
+        self.length = left.size() + right.size()
+        self.flat = None
+
+    @property
+    def Value(self) -> str:
+        if self.flat is None: self.flatten()
+        return self.flat
+
+    def flatten(self) -> None:
+        parts = []
+        stack = [self.right, self.left]
+        while stack:
+            s = stack.pop()
+            if s.__class__ is Rope and s.flat is None: stack.extend((s.right, s.left))
+            else: parts.append(s.Value)
+        self.flat = ''.join(parts)
+        self.left = self.right = None  # let the pieces go
+
+    def size(self) -> int: return self.length
+
 class Array(Object):
-    def __init__(self, Elements: list[Object]): self.Elements = Elements
+    # An offset view [start, end) over a buffer that may be shared with other arrays.
+    # Monkey values are immutable, so rest() just narrows the view, and push() appends
+    # in place when no other array has claimed the buffer's tail yet, copying otherwise.
+    def __init__(self, Elements: list[Object], start: int = 0, end: int | None = None):
+        self.buf = Elements
+        self.start = start
+        self.end = len(Elements) if end is None else end
+
+    @property
+    def Elements(self) -> list[Object]: return self.buf[self.start:self.end]
+
+    def __len__(self) -> int: return self.end - self.start
+    def __iter__(self): return iter(self.buf[self.start:self.end])
+
+    def __getitem__(self, i: int) -> Object:
+        if i < 0: i += self.end - self.start
+        if not 0 <= i < self.end - self.start: raise IndexError('array index out of range')
+        return self.buf[self.start + i]
+
+    def rest(self) -> "Array":
+        return self.__class__(self.buf, min(self.start + 1, self.end), self.end)
+
+    def slice(self, i: int, j: int) -> "Array":
+        n = self.end - self.start
+        i, j = min(i, n), min(j, n)
+        return self.__class__(self.buf, self.start + i, self.start + max(i, j))
+
+    def push(self, elem: Object) -> "Array":
+        if self.end == len(self.buf):
+            self.buf.append(elem)
+            return self.__class__(self.buf, self.start, self.end + 1)
+        new_buf = self.buf[self.start:self.end]
+        new_buf.append(elem)
+        return self.__class__(new_buf)
+
     def Type(self): return ARRAY_OBJ
-    def Inspect(self) -> str: return f"[{', '.join([x.Inspect() for x in self.Elements])}]"
+    def Inspect(self) -> str: return f"[{', '.join([x.Inspect() for x in self])}]"
+
+class IntArray(Array):
+    # An Array whose elements are all integers, kept unboxed in an int64 buffer (array('q')).
+    # new_array picks it when it can; elements are boxed only when read one at a time or
+    # inspected, while the vectorized builtins work on values() directly. Pushing anything
+    # that is not an int64 integer falls back to a plain Array.
+    @property
+    def Elements(self) -> list[Object]: return [new_integer(v) for v in self.buf[self.start:self.end]]
+
+    def __iter__(self): return map(new_integer, self.buf[self.start:self.end])
+    def __getitem__(self, i: int) -> Object: return new_integer(Array.__getitem__(self, i))
+
+    def values(self) -> array.array: return self.buf[self.start:self.end]
+
+    def push(self, elem: Object) -> Array:
+        if elem.__class__ is Integer and INT64_MIN <= elem.Value <= INT64_MAX: return Array.push(self, elem.Value)
+        return Array(self.Elements + [elem])
+
+    def Inspect(self) -> str: return f"[{', '.join(map(str, self.buf[self.start:self.end]))}]"
 
 class Hash(Object):
-    def __init__(self, Elements: dict): self.Elements = Elements
+    # Pairs maps each key's HashKey to its (key, value) pair: a dict for hash literals, or a
+    # persistent hamt.Map once set()/delete() make new versions, which then share all but the
+    # changed path with the hash they came from. Either way a lookup is a single probe.
+    def __init__(self, Pairs: dict | hamt.Map): self.Pairs = Pairs
+
+    def get(self, key: Object) -> Object | None:
+        pair = self.Pairs.get(key.HashKey(), None)
+        return None if pair is None else pair[1]
+
+    def set(self, key: Object, value: Object) -> "Hash":
+        return Hash(self.persistent().assoc(key.HashKey(), (key, value)))
+
+    def delete(self, key: Object) -> "Hash":
+        pairs = self.persistent().dissoc(key.HashKey())
+        return self if pairs is self.Pairs else Hash(pairs)
+
+    def persistent(self) -> hamt.Map:
+        if self.Pairs.__class__ is hamt.Map: return self.Pairs
+        return hamt.Map.from_items(self.Pairs.items())
+
     def Type(self): return HASH_OBJ
-    def Inspect(self) -> str: return '{' + ', '.join([f'{x.Inspect()}: {y.Inspect()}' for x, y in self.Elements.items()]) + '}'
+    def Inspect(self) -> str: return '{' + ', '.join([f'{x.Inspect()}: {y.Inspect()}' for x, y in self.Pairs.values()]) + '}'
 
 class ReturnValue(Object):
     def __init__(self, Value: Object): self.Value = Value
     def Type(self): return RETURN_OBJ
     def Inspect(self): return self.Value.Inspect()
 
+class TailCall(Object):
+    # returned by a call in tail position instead of recursing; apply_function trampolines on it
+    def __init__(self, func: Object, args: list[Object]):
+        self.func = func
+        self.args = args
+    def Type(self): return TAIL_CALL_OBJ
+    def Inspect(self): return f"tail call to {self.func.Inspect()}"
+
 class Error(Object):
     def __init__(self, Message: str): self. Message = Message
     def Type(self): return ERROR_OBJ
     def Inspect(self): return f"Error: {(self.Message)}"
 
 class Function(Object):
-    def __init__(self, Params: list[ast.Identifier], Body: ast.BlockStatement, env: Environment):
+    def __init__(self, Params: list[ast.Identifier], Body: ast.BlockStatement, env: Environment | Frame, compiled: Callable | None = None, scope=None):
         self.Params = Params
         self.Body = Body
         self.env = env
+        self.scope = scope  # resolver.Scope of the literal; calls then get a Frame instead of an Environment
+        self.compiled = compiled  # Body lowered by closure_compiler, if it was
+        self.calls = 0  # counted by the jit until the body is translated
+        self.memo = None  # memo.Table, or memo.IMPURE, once memo has looked at this function
 
     def Type(self) -> ObjectType:
         return FUNCTION_OBJ
@@ -99,3 +277,96 @@ class BuiltIn(Object):
     def Type(self): return BUILTIN_OBJ
     def Inspect(self): return "builtin function"
 
+
+class CompiledFunction(Object):
+    def __init__(self, instructions: list[int], num_locals: int, num_params: int, literal: ast.FunctionLiteral,
+                 cells: tuple[int, ...] = (), fallbacks: dict[int, tuple] | None = None):
+        self.instructions = instructions
+        self.num_locals = num_locals
+        self.num_params = num_params
+        self.literal = literal  # kept for Inspect
+        self.cells = cells  # local slots that inner functions capture, boxed in a cell on each call
+        self.fallbacks = fallbacks if fallbacks is not None else {}  # ip -> (name, candidates) for reads that may find a slot unset
+
+    def Type(self): return COMPILED_FUNCTION_OBJ
+    def Inspect(self): return f'compiled fn ({", ".join([str(x) for x in self.literal.Parameters])})'
+
+class Closure(Object):
+    def __init__(self, fn: CompiledFunction, free: list[list]):
+        self.fn = fn
+        self.free = free  # one-element cells shared with the enclosing frames
+
+    # closures are what the VM hands out in place of Function, so they look the same from the outside
+    def Type(self) -> ObjectType: return FUNCTION_OBJ
+    def Inspect(self) -> str:
+        return f'fn ({", ".join([str(x) for x in self.fn.literal.Parameters])})' + '{\n' + str(self.fn.literal.Body) + '\n}'
+
+
+# ===
+# Small integers, string concatenation, integer arrays and allocation counting
+# ===
+
+# Integers are immutable, so results in this range can share one object instead of allocating
+SMALL_INT_MIN, SMALL_INT_MAX = -5, 256
+SMALL_INTS = [Integer(v) for v in range(SMALL_INT_MIN, SMALL_INT_MAX + 1)]
+
+def new_integer(v: int) -> Integer:
+    if SMALL_INT_MIN <= v <= SMALL_INT_MAX: return SMALL_INTS[v - SMALL_INT_MIN]
+    return Integer(v)
+
+# shorter concatenations are copied right away; a rope node only pays off past this
+ROPE_MIN = 256
+
+def concat(left: String, right: String) -> String:
+    if left.size() + right.size() < ROPE_MIN: return String(left.Value + right.Value)
+    return Rope(left, right)
+
+INT64_MIN, INT64_MAX = -2**63, 2**63 - 1
+
+def new_array(elements: list[Object]) -> Array:
+    # array literals: an IntArray when every element is an int64 integer (so [] is one too)
+    for e in elements:
+        if e.__class__ is not Integer: return Array(elements)
+    return new_int_array([e.Value for e in elements])
+
+def allocating(n: int) -> None:
+    # called before building an n-element array buffer; budget.charging() replaces it with a
+    # check that refuses one the allocation budget cannot cover, before it exists
+    pass
+
+def new_int_array(values) -> Array:
+    # raw ints from a kernel or builtin; out-of-range values get a boxed Array instead
+    try:
+        return IntArray(values if values.__class__ is array.array else array.array('q', values))
+    except OverflowError:
+        return Array([new_integer(v) for v in values])
+
+@contextmanager
+def count_allocations() -> Iterator[Counter]:
+    # counts constructor calls per object class for the duration of the block; classes are
+    # only patched while it is active, so normal runs pay nothing for it
+    counts: Counter = Counter()
+    classes = [Environment, Frame]
+    pending = [Object]
+    while pending:  # every subclass, not just the direct ones: Rope is a String, IntArray an Array
+        subclasses = pending.pop().__subclasses__()
+        classes.extend(subclasses)
+        pending.extend(subclasses)
+    saved = {cls: cls.__dict__.get('__init__', None) for cls in classes}
+    # wrap the inits as resolved before any patching, so a subclass that inherits its init does
+    # not run its parent's counting wrapper as well and get counted twice
+    inits = {cls: cls.__init__ for cls in classes}
+
+    def counting(cls, init):
+        def __init__(self, *args, **kwargs):
+            counts[cls.__name__] += 1
+            init(self, *args, **kwargs)
+        return __init__
+
+    for cls in classes: cls.__init__ = counting(cls, inits[cls])
+    try:
+        yield counts
+    finally:
+        for cls, init in saved.items():
+            if init is None: del cls.__init__
+            else: cls.__init__ = init
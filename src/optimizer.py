@@ -0,0 +1,130 @@
+from . import ast, object_, token, evaluator
+
+# Optional AST rewrite run before evaluation:
+# - infix/prefix expressions over integer, string and boolean literals are folded into a literal,
+#   using the evaluator's own operator code. When that yields an Error the node is left alone,
+#   so the error still happens at run time, in order, with its original message.
+# - an if with a literal condition is replaced by the branch it takes: by that branch's
+#   expression in expression position, or by its statements spliced into the enclosing block
+#   (blocks do not open scopes in Monkey, and a block's value is that of its last statement).
+# - statements after a return in the same block are dropped.
+# Division is never folded: the evaluator's `/` can raise on a zero divisor.
+
+LITERALS = (ast.IntegerLiteral, ast.StringLiteral, ast.Boolean)
+
+
+class Report:
+    def __init__(self):
+        self.folded: list[tuple[str, str]] = []
+        self.pruned: list[tuple[str, bool]] = []
+        self.dropped = 0
+
+    def __str__(self) -> str:
+        lines = [f'optimizer: {len(self.folded)} folded, {len(self.pruned)} branches pruned, {self.dropped} unreachable statements dropped']
+        for before, after in self.folded: lines.append(f'  folded  {before} -> {after}')
+        for cond, taken in self.pruned: lines.append(f'  pruned  if {cond}: always {"consequence" if taken else "alternative"}')
+        return '\n'.join(lines)
+
+
+def optimize(program: ast.Program) -> Report:
+    report = Report()
+    program.Statements = optimize_statements(program.Statements, report)
+    return report
+
+
+def optimize_statements(stmts: list[ast.Statement], report: Report) -> list[ast.Statement]:
+    out = []
+    for i, stmt in enumerate(stmts):
+        stmt = optimize_node(stmt, report)
+        last = i == len(stmts) - 1
+        start = len(out)
+        if isinstance(stmt, ast.ExpressionStatement) and isinstance(stmt.Expression_, ast.IFExpression) and constant_condition(stmt.Expression_) is not None:
+            node = stmt.Expression_
+            taken = constant_condition(node)
+            branch = node.Consequence if taken else node.Alternative
+            spliced = branch.Statements if branch is not None else []
+            # an empty branch still gives the block its null value when it is the last statement
+            if spliced or not last:
+                report.pruned.append((str(node.Condition), taken))
+                out.extend(spliced)
+            else: out.append(stmt)
+        else: out.append(stmt)
+
+        for j in range(start, len(out)):
+            if isinstance(out[j], ast.ReturnStatement):
+                report.dropped += len(out) - j - 1 + len(stmts) - i - 1
+                return out[:j+1]
+    return out
+
+def optimize_node(node: ast.Node | None, report: Report) -> ast.Node | None:
+    if node is None: return None
+
+    if isinstance(node, ast.ExpressionStatement):
+        node.Expression_ = optimize_node(node.Expression_, report)
+    elif isinstance(node, (ast.LetStatement, ast.ReturnStatement)):
+        node.Value = optimize_node(node.Value, report)
+    elif isinstance(node, ast.BlockStatement):
+        node.Statements = optimize_statements(node.Statements, report)
+
+    elif isinstance(node, ast.PrefixExpression):
+        node.Right = optimize_node(node.Right, report)
+        if isinstance(node.Right, LITERALS):
+            return fold(node, evaluator.evaluate_prefix_expression(node.Operator, to_object(node.Right)), report)
+
+    elif isinstance(node, ast.InfixExpression):
+        node.Left = optimize_node(node.Left, report)
+        node.Right = optimize_node(node.Right, report)
+        if node.Operator != '/' and isinstance(node.Left, LITERALS) and isinstance(node.Right, LITERALS):
+            return fold(node, evaluator.evaluate_infix_expression(node.Operator, to_object(node.Left), to_object(node.Right)), report)
+
+    elif isinstance(node, ast.IFExpression):
+        node.Condition = optimize_node(node.Condition, report)
+        node.Consequence = optimize_node(node.Consequence, report)
+        node.Alternative = optimize_node(node.Alternative, report)
+        taken = constant_condition(node)
+        if taken is not None:
+            # in expression position only a branch that is a single expression can stand in for the if
+            branch = node.Consequence if taken else node.Alternative
+            if branch is not None and len(branch.Statements) == 1 and isinstance(branch.Statements[0], ast.ExpressionStatement) and branch.Statements[0].Expression_ is not None:
+                report.pruned.append((str(node.Condition), taken))
+                return branch.Statements[0].Expression_
+
+    elif isinstance(node, ast.FunctionLiteral):
+        node.Body = optimize_node(node.Body, report)
+    elif isinstance(node, ast.CallExpression):
+        node.Function = optimize_node(node.Function, report)
+        node.Arguments = [optimize_node(a, report) for a in node.Arguments]
+    elif isinstance(node, ast.ArrayLiteral):
+        node.Elements = [optimize_node(e, report) for e in node.Elements]
+    elif isinstance(node, ast.IndexExpression):
+        node.Left = optimize_node(node.Left, report)
+        node.Right = optimize_node(node.Right, report)
+    elif isinstance(node, ast.HashLiteral):
+        node.Elements = [(optimize_node(k, report), optimize_node(v, report)) for k, v in node.Elements]
+
+    return node
+
+
+def constant_condition(node: ast.IFExpression) -> bool | None:
+    # the evaluator branches on cond.Value, so literal truthiness is python truthiness
+    if isinstance(node.Condition, LITERALS): return bool(node.Condition.Value)
+    return None
+
+def to_object(node: ast.Expression) -> object_.Object:
+    if isinstance(node, ast.IntegerLiteral): return object_.Integer(node.Value)
+    if isinstance(node, ast.StringLiteral): return object_.String(node.Value)
+    return evaluator.TRUE if node.Value else evaluator.FALSE
+
+def to_literal(obj: object_.Object) -> ast.Expression | None:
+    if isinstance(obj, object_.Integer): return ast.IntegerLiteral(Token=token.Token(token.INT, str(obj.Value)), Value=obj.Value)
+    if isinstance(obj, object_.String): return ast.StringLiteral(Token=token.Token(token.STRING, obj.Value), Value=obj.Value)
+    if isinstance(obj, object_.Boolean):
+        if obj.Value: return ast.Boolean(Token=token.Token(token.TRUE, 'true'), Value=True)
+        return ast.Boolean(Token=token.Token(token.FALSE, 'false'), Value=False)
+    return None
+
+def fold(node: ast.Expression, res: object_.Object | None, report: Report) -> ast.Expression:
+    literal = to_literal(res) if res is not None else None
+    if literal is None: return node  # an Error: leave it to happen at run time
+    report.folded.append((str(node), str(literal)))
+    return literal
@@ -1,5 +1,4 @@
 from typing import Callable
-from pydantic import BaseModel
 from enum import IntEnum, auto
 
 from . import ast, lexer, token
@@ -28,18 +27,17 @@ precedence_map = {
     token.LBRACKET: Precedence.INDEX,
 }
 
-class Parser(BaseModel):
-    l: lexer.Lexer
+class Parser:
+    def __init__(self, l: lexer.Lexer | lexer.Scanner):
+        self.l = l
 
-    curr_token: token.Token | None = None
-    peek_token: token.Token | None = None
-    errors    : list[str] | None = None
+        self.curr_token: token.Token | None = None
+        self.peek_token: token.Token | None = None
+        self.errors    : list[str] | None = None
 
-    prefix_parse_fns: dict[token.TokenType, Callable] | None = None
-    infix_parse_fns : dict[token.TokenType, Callable] | None = None
+        self.prefix_parse_fns: dict[token.TokenType, Callable] | None = None
+        self.infix_parse_fns : dict[token.TokenType, Callable] | None = None
 
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
         self.next_token()
         self.next_token()
 
@@ -82,7 +80,7 @@ class Parser(BaseModel):
 
     def next_token(self):
         self.curr_token = self.peek_token
-        self.peek_token = lexer.next_token(self.l)
+        self.peek_token = self.l.next_token() if isinstance(self.l, lexer.Scanner) else lexer.next_token(self.l)
 
 
     def parse_program(self) -> ast.Program | None:
@@ -0,0 +1,154 @@
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from . import ast, object_, jit
+from .builtins_ import builtins
+
+# Deterministic profiler for the tree walker. evaluator.apply_function hands every call to
+# call() while profiling is on; a tail call that the trampoline turns into a loop replaces the
+# current profiler frame (tail()), just as it replaces the caller. Per function we record calls,
+# inclusive and exclusive wall time and allocations; a recursive function's inclusive figures
+# count only its outermost activation. Exclusive time is also kept per call stack, for
+# flamegraph tools' collapsed-stack format.
+#
+# Functions are named after the let that binds them, qualified by enclosing functions
+# (map.iter); anonymous literals get their parameter list and an ordinal, since tokens carry
+# no source positions. Builtins appear as builtin:<name>.
+
+enabled = False
+
+
+class Stat:
+    __slots__ = ('calls', 'incl', 'excl', 'allocs_incl', 'allocs_excl', 'active')
+
+    def __init__(self):
+        self.calls = self.incl = self.excl = self.allocs_incl = self.allocs_excl = self.active = 0
+
+
+class Frame:
+    __slots__ = ('name', 'stack', 'start', 'start_allocs', 'child', 'child_allocs')
+
+    def __init__(self, name: str, stack: str, start: int, start_allocs: int):
+        self.name = name
+        self.stack = stack  # collapsed call stack, ';'-joined
+        self.start = start
+        self.start_allocs = start_allocs
+        self.child = 0
+        self.child_allocs = 0
+
+
+stats: dict[str, Stat] = {}
+stacks: dict[str, int] = {}  # collapsed stack -> exclusive ns
+frames: list[Frame] = []
+names: dict[int, tuple[ast.BlockStatement, str]] = {}  # id(FunctionLiteral.Body) -> (body, name)
+builtin_names = {id(b): f'builtin:{name}' for name, b in builtins.items()}
+allocations = None  # object_.count_allocations() counter while profiling
+
+
+@contextmanager
+def profiling() -> Iterator[None]:
+    global enabled, allocations
+    with object_.count_allocations() as counts:
+        allocations = counts
+        enabled = True
+        try:
+            yield
+        finally:
+            enabled = False
+            allocations = None
+            frames.clear()
+
+def reset() -> None:
+    stats.clear()
+    stacks.clear()
+    names.clear()
+
+
+# ===
+# Hooks
+# ===
+
+def call(func: object_.Object, args: list[object_.Object], apply: Callable) -> object_.Object:
+    if func.__class__ is not object_.Function and func.__class__ is not object_.BuiltIn: return apply(func, args)
+    depth = len(frames)
+    enter(name_of(func))
+    try:
+        return apply(func, args)
+    finally:
+        # tail() may have swapped the frame, and an exception may have left callees behind
+        while len(frames) > depth: exit()
+
+def tail(func: object_.Function) -> None:
+    exit()
+    enter(name_of(func))
+
+def enter(name: str) -> None:
+    stack = f'{frames[-1].stack};{name}' if frames else name
+    frames.append(Frame(name, stack, time.perf_counter_ns(), allocated()))
+    stat = stats.get(name, None)
+    if stat is None: stat = stats[name] = Stat()
+    stat.calls += 1
+    stat.active += 1
+
+def exit() -> None:
+    f = frames.pop()
+    elapsed = time.perf_counter_ns() - f.start
+    allocs = allocated() - f.start_allocs
+    stat = stats[f.name]
+    stat.active -= 1
+    stat.excl += elapsed - f.child
+    stat.allocs_excl += allocs - f.child_allocs
+    if stat.active == 0:
+        stat.incl += elapsed
+        stat.allocs_incl += allocs
+    stacks[f.stack] = stacks.get(f.stack, 0) + elapsed - f.child
+    if frames:
+        frames[-1].child += elapsed
+        frames[-1].child_allocs += allocs
+
+def allocated() -> int:
+    return sum(allocations.values()) if allocations is not None else 0
+
+
+# ===
+# Naming
+# ===
+
+def name_functions(node: ast.Node | None, scope: str = '') -> None:
+    if node is None: return
+    if isinstance(node, ast.LetStatement) and isinstance(node.Value, ast.FunctionLiteral):
+        name = f'{scope}.{node.Name.Value}' if scope else node.Name.Value
+        if id(node.Value.Body) not in names: names[id(node.Value.Body)] = (node.Value.Body, name)
+        name_functions(node.Value.Body, names[id(node.Value.Body)][1])
+        return
+    if isinstance(node, ast.FunctionLiteral):
+        if id(node.Body) not in names:
+            params = ', '.join([p.Value for p in node.Parameters])
+            name = f'<fn({params}) #{len(names) + 1}>'
+            names[id(node.Body)] = (node.Body, f'{scope}.{name}' if scope else name)
+        name_functions(node.Body, names[id(node.Body)][1])
+        return
+    for child in ast.children(node): name_functions(child, scope)
+
+def name_of(func: object_.Object) -> str:
+    if func.__class__ is object_.BuiltIn: return builtin_names.get(id(func), 'builtin')
+    named = names.get(id(func.Body), None)
+    return named[1] if named is not None else jit.describe(func)
+
+
+# ===
+# Output
+# ===
+
+def report(limit: int | None = None) -> str:
+    rows = sorted(stats.items(), key=lambda kv: kv[1].excl, reverse=True)
+    if limit is not None: rows = rows[:limit]
+    lines = [f'{"calls":>9} {"incl ms":>10} {"excl ms":>10} {"incl allocs":>12} {"excl allocs":>12}  function']
+    for name, s in rows:
+        lines.append(f'{s.calls:>9} {s.incl / 1e6:>10.2f} {s.excl / 1e6:>10.2f} {s.allocs_incl:>12} {s.allocs_excl:>12}  {name}')
+    return '\n'.join(lines)
+
+def collapsed() -> str:
+    # one "a;b;c <microseconds>" line per call stack, as flamegraph.pl and speedscope read them
+    return '\n'.join([f'{stack} {ns // 1000}' for stack, ns in sorted(stacks.items()) if ns >= 1000])
@@ -0,0 +1,70 @@
+from . import ast
+
+# Static scope resolution for the tree walker.
+#
+# Every function literal gets a Scope: one slot per parameter and per name let-bound anywhere in
+# its body (blocks do not open scopes in Monkey). Every identifier gets the (depth, slot) of each
+# enclosing function scope that binds its name, innermost first. At runtime the evaluator tries
+# those slots in order, skipping unset ones, and only then falls back to the global dict and the
+# builtins. Trying every candidate keeps the old dict-chain behaviour for a name read before its
+# let has run. Top-level names are never given slots, so they stay late-bound and the REPL can
+# redefine them. A slot read from inside a nested function is recorded as captured; the bytecode
+# compiler keeps those in cells.
+
+
+class Scope:
+    def __init__(self, outer: "Scope | None"):
+        self.outer = outer
+        self.names: dict[str, int] = {}
+        self.size = 0
+        self.captured: set[int] = set()
+
+    def define(self, name: str, fresh: bool = False) -> int:
+        # parameters always get a fresh slot so that fn(x, x) binds x to the last argument, as set_ did
+        if not fresh and name in self.names: return self.names[name]
+        self.names[name] = self.size
+        self.size += 1
+        return self.names[name]
+
+
+def resolve(node: ast.Node | None, scope: Scope | None = None) -> None:
+    if node is None: return
+
+    if isinstance(node, ast.FunctionLiteral):
+        fscope = Scope(scope)
+        for p in node.Parameters: fscope.define(p.Value, fresh=True)
+        for name in let_names(node.Body): fscope.define(name)
+        for p in node.Parameters: p.Resolved = candidates(fscope, p.Value)
+        node.Scope = fscope
+        resolve(node.Body, fscope)
+        return
+
+    if isinstance(node, ast.Identifier):
+        node.Resolved = candidates(scope, node.Value, read=True)
+        return
+
+    if isinstance(node, ast.LetStatement):
+        resolve(node.Value, scope)
+        node.Name.Resolved = candidates(scope, node.Name.Value)
+        return
+
+    for child in ast.children(node): resolve(child, scope)
+
+def candidates(scope: Scope | None, name: str, read: bool = False) -> tuple[tuple[int, int], ...]:
+    found = []
+    depth = 0
+    while scope is not None:
+        slot = scope.names.get(name, None)
+        if slot is not None:
+            found.append((depth, slot))
+            if read and depth: scope.captured.add(slot)
+        scope = scope.outer
+        depth += 1
+    return tuple(found)
+
+def let_names(node: ast.Node | None) -> list[str]:
+    # let-bound names in a function body, not descending into nested function literals
+    if node is None or isinstance(node, ast.FunctionLiteral): return []
+    names = [node.Name.Value] if isinstance(node, ast.LetStatement) else []
+    for child in ast.children(node): names.extend(let_names(child))
+    return names
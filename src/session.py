@@ -0,0 +1,51 @@
+from . import ast, lexer, parser, object_, budget as budget_
+
+# Engine dispatch shared by main.py, the batch runner and the benchmarks. Each engine's modules
+# are imported the first time a session runs on it, so a run only loads the engine it uses.
+
+ENGINES = ['eval', 'vm', 'closure', 'unboxed', 'unwind']
+
+
+def new_parser(inp: str, scanner: bool = False) -> parser.Parser:
+    if scanner: return parser.Parser(l=lexer.Scanner(inp))
+    l = lexer.Lexer(inp=inp)
+    lexer.read_char(l)
+    return parser.Parser(l=l)
+
+def parse(inp: str, scanner: bool = False) -> tuple[ast.Program, list[str]]:
+    p = new_parser(inp, scanner)
+    program = p.parse_program()
+    return program, p.errors
+
+
+class Session:
+    # state that has to outlive a single program: the eval env, or the vm's symbols/constants/globals
+    def __init__(self, engine: str, budget: budget_.Budget | None = None):
+        if budget is not None and engine != 'eval': raise ValueError(f'execution budgets need the eval engine, not {engine}')
+        self.engine = engine
+        self.budget = budget  # applied to each run() on its own
+        self.env = object_.Environment()
+        self.symbol_table = None
+        self.constants = []
+        self.globals_ = []
+        if engine == 'vm':
+            from . import compiler
+            self.symbol_table = compiler.new_symbol_table()
+
+    def run(self, program: ast.Program) -> object_.Object:
+        if self.engine == 'vm':
+            from . import compiler, vm
+            comp = compiler.Compiler(symbol_table=self.symbol_table, constants=self.constants)
+            comp.compile(program)
+            return vm.run(comp.bytecode(), globals_=self.globals_)
+        if self.engine == 'closure':
+            from . import closure_compiler
+            return closure_compiler.run(program, self.env)
+        if self.engine == 'unboxed':
+            from . import unboxed
+            return unboxed.run(program, self.env)
+        if self.engine == 'unwind':
+            from . import unwind
+            return unwind.run(program, self.env)
+        from . import evaluator
+        return evaluator.eval_(program, self.env, self.budget)
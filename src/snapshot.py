@@ -0,0 +1,127 @@
+import gc
+import os
+import pickle
+import tempfile
+
+from . import ast, cache, closure_compiler, hamt, object_, session
+from .builtins_ import builtins
+
+# Snapshots of a session's top-level state, so a REPL can come back with a prelude already
+# loaded instead of lexing, parsing and evaluating it again. The state (the environment, or the
+# vm's symbol table, constants and globals) is pickled whole, closures included: a Function
+# keeps its Params and Body (ast nodes, resolved scopes and all) and its env, and pickling keeps
+# environments shared by several closures shared. Objects the engines compare by identity
+# (NULL, TRUE, FALSE, builtins, the empty trie) are saved by name and come back as the same
+# instances. Function bodies keep what the resolver and the tail-call marking left on their
+# nodes, which Node.__reduce__ leaves out, since nothing resolves a restored body again. What the
+# engines cache on a Function (jit call counts, memo tables) is dropped; closure-engine bodies
+# are compiled again from the saved ast when first called, once per function literal.
+#
+# The header is cache.py's: MAGIC, the format version and the ast fingerprint, so a snapshot
+# taken before the node classes changed is refused rather than half loaded.
+
+MAGIC = b'MKYS'
+FORMAT_VERSION = 2  # 2: vm closures hold cells, and the opcodes were renumbered
+HEADER = MAGIC + FORMAT_VERSION.to_bytes(2, 'little') + cache.ast_fingerprint().encode()
+
+SHARED = {'null': object_.NULL, 'true': object_.TRUE, 'false': object_.FALSE, 'empty': hamt.EMPTY,
+          **{f'builtin:{name}': b for name, b in builtins.items()}}
+SHARED_NAMES = {id(obj): name for name, obj in SHARED.items()}
+
+compiled: dict[int, list] = {}  # id(Body) -> [Body, closure-engine body once compiled], while a snapshot loads
+
+
+def annotations(cls: type) -> tuple[str, ...]:
+    # the slots a node's constructor does not set, bar inline caches, which refer to this process's state
+    code = cls.__init__.__code__
+    return tuple([name for name in cls.__slots__ if name not in code.co_varnames[1:code.co_argcount] and name != 'Cache'])
+
+ANNOTATED = {cls: names for cls in vars(ast).values() if isinstance(cls, type) and issubclass(cls, ast.Node)
+             and '__init__' in vars(cls) and (names := annotations(cls))}
+
+
+class SnapshotError(Exception): pass
+
+
+class Pickler(pickle.Pickler):
+    def persistent_id(self, obj):
+        return SHARED_NAMES.get(id(obj), None)
+
+    def reducer_override(self, obj):
+        cls = obj.__class__
+        if cls is object_.Integer: return object_.new_integer, (obj.Value,)
+        if cls is object_.Rope: return object_.String, (obj.Value,)
+        names = ANNOTATED.get(cls, None)
+        if names is not None:
+            ctor, args = obj.__reduce__()
+            return ctor, args, (None, {name: getattr(obj, name) for name in names})
+        if cls is object_.Function:
+            # env goes in the state, after the function exists, since it usually leads back to it
+            return new_function, (obj.Params, obj.Body, obj.scope, obj.compiled is not None), {'env': obj.env}
+        return NotImplemented
+
+
+class Unpickler(pickle.Unpickler):
+    def persistent_load(self, name):
+        obj = SHARED.get(name, None)
+        if obj is None: raise pickle.UnpicklingError(f'unknown shared object {name!r}')
+        return obj
+
+
+def new_function(Params, Body, scope, is_compiled: bool) -> object_.Function:
+    func = object_.Function(Params=Params, Body=Body, env=None, scope=scope)
+    if is_compiled:
+        # compiled on the first call, once for all the closures of a literal
+        cell = compiled.get(id(Body), None)
+        if cell is None: cell = compiled[id(Body)] = [Body, None]
+        def compile_on_call(env):
+            if cell[1] is None: cell[1] = closure_compiler.compile_(cell[0])
+            func.compiled = cell[1]
+            return cell[1](env)
+        func.compiled = compile_on_call
+    return func
+
+
+# ===
+# Saving and loading
+# ===
+
+def state(sess: session.Session):
+    if sess.engine == 'vm': return sess.symbol_table, sess.constants, sess.globals_
+    return sess.env
+
+def restore(sess: session.Session, saved) -> None:
+    if sess.engine == 'vm': sess.symbol_table, sess.constants, sess.globals_ = saved
+    else: sess.env = saved
+
+def save(sess: session.Session, path: str) -> None:
+    # written to a temporary file and renamed into place, so a failed save leaves any old snapshot intact
+    tmp = None
+    try:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER)
+            Pickler(f, protocol=pickle.HIGHEST_PROTOCOL).dump((sess.engine, state(sess)))
+        os.replace(tmp, path)
+    except (OSError, RecursionError, pickle.PicklingError) as e:
+        if tmp is not None and os.path.exists(tmp): os.remove(tmp)
+        raise SnapshotError(f'cannot save snapshot to {path}: {e}') from e
+
+def load(sess: session.Session, path: str) -> None:
+    # replaces the session's top-level state with the snapshot's
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(HEADER)) != HEADER: raise SnapshotError(f'{path} is not a snapshot from this version')
+            # a snapshot is one big graph of new objects, so collecting during the load is wasted work
+            gc.disable()
+            try:
+                engine, saved = Unpickler(f).load()
+            finally:
+                gc.enable()
+                compiled.clear()
+    except OSError as e:
+        raise SnapshotError(f'cannot load snapshot from {path}: {e}') from e
+    except (pickle.UnpicklingError, EOFError, AttributeError, ValueError, TypeError) as e:
+        raise SnapshotError(f'{path} is not a valid snapshot: {e}') from e
+    if engine != sess.engine: raise SnapshotError(f'{path} was saved by the {engine} engine, not {sess.engine}')
+    restore(sess, saved)
@@ -1,11 +1,19 @@
-from pydantic import BaseModel
+TokenType = str
 
+class Token:
+    __slots__ = ('type_', 'literal')
 
-TokenType = str
+    def __init__(self, type_: TokenType, literal: str | None):
+        self.type_ = type_
+        self.literal = literal
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Token) and self.type_ == other.type_ and self.literal == other.literal
 
-class Token(BaseModel):
-    type_: TokenType
-    literal: str | None
+    def __hash__(self): return hash((self.type_, self.literal))
+    def __reduce__(self): return Token, (self.type_, self.literal)
+    def __str__(self): return f'type_={self.type_!r} literal={self.literal!r}'
+    def __repr__(self): return f'Token({self})'
 
 
 # ===
@@ -0,0 +1,194 @@
+from . import ast, object_, evaluator, resolver
+
+# Tree walker over unboxed primitives. Monkey integers and strings are carried as plain Python
+# int and str from literal to literal, through frames, arithmetic and comparisons; booleans and
+# null are the object_ singletons already. Values are boxed only where they leave the engine:
+# builtin arguments, array and hash contents, and the program's result. Anything off the int/str
+# fast paths is boxed and handed to the evaluator's helpers, so errors read exactly as eval_'s.
+# A concatenation reaching object_.ROPE_MIN characters becomes an object_.Rope, and from there
+# on takes the boxed path, so that accumulating a long string stays linear.
+
+NULL = object_.NULL
+TRUE = object_.TRUE
+FALSE = object_.FALSE
+new_error = evaluator.new_error
+
+Value = object_.Object | int | str
+
+
+def box(v: Value) -> object_.Object:
+    cls = v.__class__
+    if cls is int: return object_.new_integer(v)
+    if cls is str: return object_.String(v)
+    if cls is object_.ReturnValue: return object_.ReturnValue(box(v.Value))  # one a let kept as its value
+    return v
+
+def unbox(obj: object_.Object) -> Value:
+    cls = obj.__class__
+    if cls is object_.Integer or cls is object_.String: return obj.Value
+    return obj
+
+def run(node: ast.Program, env: object_.Environment) -> object_.Object:
+    return box(eval_(node, env))
+
+
+def eval_(node: ast.Node, env: object_.Environment | object_.Frame) -> Value:
+    if isinstance(node, ast.Program):
+        return evaluate_program(node, env)
+
+    if isinstance(node, ast.ExpressionStatement):
+        return eval_(node.Expression_, env)
+
+    if isinstance(node, (ast.IntegerLiteral, ast.StringLiteral)):
+        return node.Value
+
+    if isinstance(node, ast.Boolean):
+        return TRUE if node.Value else FALSE
+
+    if isinstance(node, ast.PrefixExpression):
+        right = eval_(node.Right, env)
+        if right.__class__ is object_.Error: return right
+        return evaluate_prefix_expression(node.Operator, right)
+
+    if isinstance(node, ast.InfixExpression):
+        left = eval_(node.Left, env)
+        if left.__class__ is object_.Error: return left
+        right = eval_(node.Right, env)
+        if right.__class__ is object_.Error: return right
+        return evaluate_infix_expression(node.Operator, left, right)
+
+    if isinstance(node, ast.IFExpression):
+        cond = eval_(node.Condition, env)
+        if cond.__class__ is object_.Error: return cond
+        if cond.__class__ is not int and cond.__class__ is not str: cond = cond.Value
+        return eval_(node.Consequence, env) if cond else eval_(node.Alternative, env)
+
+    if isinstance(node, ast.BlockStatement):
+        return evaluate_block_statements(node, env)
+
+    if isinstance(node, ast.ReturnStatement):
+        res = eval_(node.Value, env)
+        if res.__class__ is object_.Error: return res
+        return object_.ReturnValue(res)
+
+    if isinstance(node, ast.LetStatement):
+        val = eval_(node.Value, env)
+        resolved = node.Name.Resolved
+        if resolved: env.slots[resolved[0][1]] = val
+        else: env.set_(node.Name.Value, val)
+        return NULL
+
+    if isinstance(node, ast.Identifier):
+        return evaluator.evaluate_identifier(node, env)
+
+    if isinstance(node, ast.FunctionLiteral):
+        return object_.Function(Params=node.Parameters, Body=node.Body, env=env, scope=node.Scope)
+
+    if isinstance(node, ast.CallExpression):
+        func = eval_(node.Function, env)
+        if func.__class__ is object_.Error: return func
+        args = evaluate_expressions(node.Arguments, env)
+        if len(args) == 1 and args[0].__class__ is object_.Error: return args[0]
+        if node.Tail and func.__class__ is object_.Function: return object_.TailCall(func, args)
+        return apply_function(func, args)
+
+    if isinstance(node, ast.ArrayLiteral):
+        Elements = evaluate_expressions(node.Elements, env)
+        if len(Elements) == 1 and Elements[0].__class__ is object_.Error: return Elements[0]
+        return object_.new_array([box(x) for x in Elements])
+
+    if isinstance(node, ast.IndexExpression):
+        return evaluate_index_expression(node, env)
+
+    if isinstance(node, ast.HashLiteral):
+        return evaluate_hash_literal(node, env)
+
+    return NULL
+
+def evaluate_program(node: ast.Program, env: object_.Environment) -> Value:
+    resolver.resolve(node)
+    evaluator.mark_tail_calls(node)
+    ret = NULL
+    for stmt in node.Statements:
+        ret = eval_(stmt, env)
+        if ret.__class__ is object_.ReturnValue: return ret.Value
+        if ret.__class__ is object_.Error: return ret
+    return ret
+
+def evaluate_block_statements(node: ast.BlockStatement, env: object_.Environment | object_.Frame) -> Value:
+    ret = NULL
+    for stmt in node.Statements:
+        ret = eval_(stmt, env)
+        if ret.__class__ is object_.ReturnValue or ret.__class__ is object_.Error: return ret
+    return ret
+
+def evaluate_expressions(nodes: list[ast.Node], env: object_.Environment | object_.Frame) -> list[Value]:
+    results = []
+    for node in nodes:
+        res = eval_(node, env)
+        if res.__class__ is object_.Error: return [res]
+        results.append(res)
+    return results
+
+
+# ===
+# Operators
+# ===
+
+def evaluate_prefix_expression(operator: str, right: Value) -> Value:
+    if right.__class__ is int:
+        if operator == '-': return -right
+        if operator == '!': return TRUE if right == 0 else FALSE
+    return unbox(evaluator.evaluate_prefix_expression(operator, box(right)))
+
+def evaluate_infix_expression(operator: str, left: Value, right: Value) -> Value:
+    if left.__class__ is int and right.__class__ is int:
+        if operator == '+': return left + right
+        if operator == '-': return left - right
+        if operator == '*': return left * right
+        if operator == '==': return TRUE if left == right else FALSE
+        if operator == '!=': return TRUE if left != right else FALSE
+        if operator == '<': return TRUE if left < right else FALSE
+        if operator == '>': return TRUE if left > right else FALSE
+    elif left.__class__ is str and right.__class__ is str and operator == '+':
+        if len(left) + len(right) < object_.ROPE_MIN: return left + right
+        return object_.Rope(object_.String(left), object_.String(right))
+    return unbox(evaluator.evaluate_infix_expression(operator, box(left), box(right)))
+
+
+# ===
+# Calls and containers
+# ===
+
+def apply_function(func: Value, args: list[Value]) -> Value:
+    while func.__class__ is object_.Function:
+        if len(func.Params) != len(args): return new_error(f'len of args dont match len of parameters: {len(args)} != {len(func.Params)}')
+        slots = list(args)
+        if func.scope.size > len(slots): slots.extend([None] * (func.scope.size - len(slots)))
+        evaluated = eval_(func.Body, object_.Frame(slots, func.scope.names, func.env))
+        if evaluated.__class__ is object_.ReturnValue: evaluated = evaluated.Value
+        if evaluated.__class__ is not object_.TailCall: return evaluated
+        func, args = evaluated.func, evaluated.args
+
+    if func.__class__ is object_.BuiltIn: return unbox(func.func([box(a) for a in args]))
+
+    return new_error(f"not a function: {box(func).Type()}")
+
+def evaluate_index_expression(node: ast.IndexExpression, env: object_.Environment | object_.Frame) -> Value:
+    left = eval_(node.Left, env)
+    if left.__class__ is object_.Error: return left
+    if not isinstance(left, (object_.Array, object_.Hash)):
+        return new_error(f'left is not array or hash, got {box(left).Type()}')
+
+    right = eval_(node.Right, env)
+    if right.__class__ is object_.Error: return right
+    return unbox(evaluator.evaluate_index(left, box(right)))
+
+def evaluate_hash_literal(node: ast.HashLiteral, env: object_.Environment | object_.Frame) -> object_.Object:
+    result = {}
+    for key_node, value_node in node.Elements:
+        key = box(eval_(key_node, env))
+        if key.Type() not in (object_.STRING_OBJ, object_.BOOLEAN_OBJ, object_.INTEGER_OBJ):
+            return new_error(f'key type should be one of STRING, BOOLEAN or INTEGER. got={key.Type()}')
+        result[key.HashKey()] = (key, box(eval_(value_node, env)))
+    return object_.Hash(result)
@@ -0,0 +1,207 @@
+from . import ast, object_, evaluator, resolver
+
+# Tree walker that unwinds rather than checks. eval_ hands a return up as an object_.ReturnValue
+# and an error as an object_.Error value, so every node looks at what each child gave back before
+# going on. Here a runtime error raises Failure, and a return raises Return; calls catch Return
+# and the program catches both, and nothing in between looks at the values going by. A return in
+# tail position (the last statement of a function body, or of a branch of an if that is) needs
+# no unwinding at all: its value is simply what the body evaluates to, so it raises nothing and
+# allocates nothing. mark_tail_returns finds those.
+#
+# Results are eval_'s, corner cases included. A let whose value fails binds the Error and carries
+# on, and so does a hash literal's value; an if used as a value hands a return out of its branch
+# on as a ReturnValue, which acts as a return again once it reaches a statement. Budgets, the jit,
+# memoization and the profiler are the eval engine's alone.
+
+NULL = object_.NULL
+TRUE = object_.TRUE
+FALSE = object_.FALSE
+new_error = evaluator.new_error
+
+
+class Return(Exception):
+    # a return leaving its function before the end of the body
+    def __init__(self, value: object_.Object): self.value = value
+
+class Failure(Exception):
+    def __init__(self, error: object_.Error): self.error = error
+
+
+def run(node: ast.Program, env: object_.Environment) -> object_.Object:
+    return eval_(node, env)
+
+
+def eval_(node: ast.Node, env: object_.Environment | object_.Frame) -> object_.Object:
+    if isinstance(node, ast.Program):
+        return evaluate_program(node, env)
+
+    if isinstance(node, ast.ExpressionStatement):
+        if isinstance(node.Expression_, ast.IFExpression): return evaluate_if_expression(node.Expression_, env)
+        return eval_(node.Expression_, env)
+
+    if isinstance(node, ast.IntegerLiteral):
+        return object_.Integer(node.Value)
+
+    if isinstance(node, ast.StringLiteral):
+        return object_.String(node.Value)
+
+    if isinstance(node, ast.Boolean):
+        return TRUE if node.Value else FALSE
+
+    if isinstance(node, ast.PrefixExpression):
+        res = evaluator.evaluate_prefix_expression(node.Operator, eval_(node.Right, env))
+        if res.__class__ is object_.Error: raise Failure(res)
+        return res
+
+    if isinstance(node, ast.InfixExpression):
+        left = eval_(node.Left, env)
+        res = evaluator.evaluate_infix_expression(node.Operator, left, eval_(node.Right, env))
+        if res.__class__ is object_.Error: raise Failure(res)
+        return res
+
+    if isinstance(node, ast.IFExpression):
+        # an if used as a value: eval_ gives a return from its branch back as a ReturnValue
+        try:
+            return evaluate_if_expression(node, env)
+        except Return as r:
+            return object_.ReturnValue(r.value)
+
+    if isinstance(node, ast.BlockStatement):
+        return evaluate_block_statements(node, env)
+
+    if isinstance(node, ast.ReturnStatement):
+        res = eval_(node.Value, env)
+        if node.Tail and res.__class__ is not object_.ReturnValue: return res
+        raise Return(res)
+
+    if isinstance(node, ast.LetStatement):
+        try:
+            val = eval_(node.Value, env)
+        except Failure as f:
+            val = f.error
+        resolved = node.Name.Resolved
+        if resolved: env.slots[resolved[0][1]] = val
+        else: env.set_(node.Name.Value, val)
+        return NULL
+
+    if isinstance(node, ast.Identifier):
+        val = evaluator.evaluate_identifier(node, env)
+        if val.__class__ is object_.Error: raise Failure(val)
+        return val
+
+    if isinstance(node, ast.FunctionLiteral):
+        return object_.Function(Params=node.Parameters, Body=node.Body, env=env, scope=node.Scope)
+
+    if isinstance(node, ast.CallExpression):
+        func = eval_(node.Function, env)
+        args = [eval_(arg, env) for arg in node.Arguments]
+        if node.Tail and func.__class__ is object_.Function: return object_.TailCall(func, args)
+        return apply_function(func, args)
+
+    if isinstance(node, ast.ArrayLiteral):
+        return object_.new_array([eval_(element, env) for element in node.Elements])
+
+    if isinstance(node, ast.IndexExpression):
+        return evaluate_index_expression(node, env)
+
+    if isinstance(node, ast.HashLiteral):
+        return evaluate_hash_literal(node, env)
+
+    return NULL
+
+def evaluate_program(node: ast.Program, env: object_.Environment) -> object_.Object:
+    resolver.resolve(node)
+    evaluator.mark_tail_calls(node)
+    mark_tail_returns(node)
+    ret = NULL
+    try:
+        for stmt in node.Statements:
+            ret = eval_(stmt, env)
+            if ret.__class__ is object_.ReturnValue: return ret.Value
+    except Return as r:
+        return r.value
+    except Failure as f:
+        return f.error
+    return ret
+
+def evaluate_block_statements(node: ast.BlockStatement, env: object_.Environment | object_.Frame) -> object_.Object:
+    ret = NULL
+    for stmt in node.Statements:
+        ret = eval_(stmt, env)
+        # only a ReturnValue kept as a value (by a let, say) still needs looking at
+        if ret.__class__ is object_.ReturnValue: raise Return(ret.Value)
+    return ret
+
+def evaluate_if_expression(node: ast.IFExpression, env: object_.Environment | object_.Frame) -> object_.Object:
+    cond = eval_(node.Condition, env)
+    return eval_(node.Consequence, env) if cond.Value else eval_(node.Alternative, env)
+
+
+# ===
+# Calls and containers
+# ===
+
+def apply_function(func: object_.Object, args: list[object_.Object]) -> object_.Object:
+    while func.__class__ is object_.Function:
+        if len(func.Params) != len(args): raise Failure(new_error(f'len of args dont match len of parameters: {len(args)} != {len(func.Params)}'))
+        slots = list(args)
+        if func.scope.size > len(slots): slots.extend([None] * (func.scope.size - len(slots)))
+        try:
+            evaluated = evaluate_block_statements(func.Body, object_.Frame(slots, func.scope.names, func.env))
+        except Return as r:
+            evaluated = r.value
+        if evaluated.__class__ is not object_.TailCall: return evaluated
+        func, args = evaluated.func, evaluated.args
+
+    if func.__class__ is object_.BuiltIn:
+        res = func.func(args)
+        if res.__class__ is object_.Error: raise Failure(res)
+        return res
+
+    raise Failure(new_error(f"not a function: {func.Type()}"))
+
+def evaluate_index_expression(node: ast.IndexExpression, env: object_.Environment | object_.Frame) -> object_.Object:
+    left = eval_(node.Left, env)
+    if left.Type() not in (object_.ARRAY_OBJ, object_.HASH_OBJ): raise Failure(new_error(f'left is not array or hash, got {left.Type()}'))
+    res = evaluator.evaluate_index(left, eval_(node.Right, env))
+    if res.__class__ is object_.Error: raise Failure(res)
+    return res
+
+def evaluate_hash_literal(node: ast.HashLiteral, env: object_.Environment | object_.Frame) -> object_.Object:
+    result = {}
+    for key_node, value_node in node.Elements:
+        try:
+            key = eval_(key_node, env)
+        except Failure as f:
+            key = f.error
+        if key.Type() not in (object_.STRING_OBJ, object_.BOOLEAN_OBJ, object_.INTEGER_OBJ):
+            raise Failure(new_error(f'key type should be one of STRING, BOOLEAN or INTEGER. got={key.Type()}'))
+        try:
+            value = eval_(value_node, env)
+        except Failure as f:
+            value = f.error
+        result[key.HashKey()] = (key, value)
+    return object_.Hash(result)
+
+
+# ===
+# Tail returns
+# ===
+# A return is in tail position when it is the last statement of a function body, or of a branch
+# of an if that is itself the last statement (as a statement, not as a value) of such a block.
+# Marks are recomputed on each pass, like evaluator.mark_tail_calls's.
+
+def mark_tail_returns(node, tails: set[int] = frozenset()) -> None:
+    if isinstance(node, ast.ReturnStatement): node.Tail = id(node) in tails
+    elif isinstance(node, ast.FunctionLiteral):
+        tails = set()
+        mark_tail_statements(node.Body, tails)
+    for child in ast.children(node): mark_tail_returns(child, tails)
+
+def mark_tail_statements(block: ast.BlockStatement | None, tails: set[int]) -> None:
+    if block is None or len(block.Statements) == 0: return
+    last = block.Statements[-1]
+    if isinstance(last, ast.ReturnStatement): tails.add(id(last))
+    elif isinstance(last, ast.ExpressionStatement) and isinstance(last.Expression_, ast.IFExpression):
+        mark_tail_statements(last.Expression_.Consequence, tails)
+        mark_tail_statements(last.Expression_.Alternative, tails)
@@ -0,0 +1,74 @@
+import array
+import operator
+
+from . import object_
+
+# Kernels behind the vectorized builtins and elementwise array arithmetic. They take the raw
+# ints of an array (ints()): an IntArray's int64 buffer, or a plain Array's values when every
+# element is an Integer. numpy is optional and imported on first use; when it is there, buffers
+# of at least NUMPY_MIN elements are viewed as int64 ndarrays without copying, otherwise the
+# kernels loop over the raw ints in Python, which still skips boxing. Monkey integers are
+# unbounded and int64 is not, so numpy arithmetic only runs when the operands' magnitudes show
+# the result cannot overflow.
+
+NUMPY_MIN = 64
+
+numpy = None  # the module once loaded, False when it is not installed
+
+OPERATORS = {'+': operator.add, '*': operator.mul}
+
+
+def load_numpy():
+    global numpy
+    if numpy is None:
+        try:
+            import numpy as np
+        except ImportError:
+            np = False
+        numpy = np
+    return numpy
+
+def ints(arr: object_.Array) -> array.array | list[int] | None:
+    # a copy either way, of a view (say, from slice) as much as of a whole array
+    object_.allocating(len(arr))
+    if arr.__class__ is object_.IntArray: return arr.values()
+    values = []
+    for x in arr:
+        if x.__class__ is not object_.Integer: return None
+        values.append(x.Value)
+    return values
+
+def ndarray(values: array.array | list[int]):
+    # an int64 view of values when numpy is worth it, None otherwise
+    if values.__class__ is not array.array or len(values) < NUMPY_MIN: return None
+    np = load_numpy()
+    return np.frombuffer(values, dtype=np.int64) if np else None
+
+def magnitude(x) -> int:
+    return max(-int(x.min()), int(x.max()))
+
+
+# ===
+# Kernels
+# ===
+
+def sum_(values: array.array | list[int]) -> int:
+    x = ndarray(values)
+    if x is not None and len(x) * magnitude(x) <= object_.INT64_MAX: return int(x.sum())
+    return sum(values)
+
+def max_(values: array.array | list[int]) -> int:
+    x = ndarray(values)
+    return int(x.max()) if x is not None else max(values)
+
+def min_(values: array.array | list[int]) -> int:
+    x = ndarray(values)
+    return int(x.min()) if x is not None else min(values)
+
+def elementwise(op: str, a: array.array | list[int], b: array.array | list[int]) -> array.array | list[int]:
+    x, y = ndarray(a), ndarray(b)
+    if x is not None and y is not None:
+        ma, mb = magnitude(x), magnitude(y)
+        if (ma + mb if op == '+' else ma * mb) <= object_.INT64_MAX:
+            return array.array('q', (x + y if op == '+' else x * y).tobytes())
+    return list(map(OPERATORS[op], a, b))
@@ -0,0 +1,312 @@
+from . import object_, evaluator
+from .compiler import (
+    Bytecode, LOCAL_SCOPE, CELL_SCOPE, FREE_SCOPE,
+    OP_CONSTANT, OP_POP, OP_TRUE, OP_FALSE, OP_NULL,
+    OP_ADD, OP_SUB, OP_MUL, OP_DIV, OP_EQ, OP_NOT_EQ, OP_GT, OP_LT,
+    OP_MINUS, OP_BANG, OP_JUMP, OP_JUMP_NOT_TRUTHY,
+    OP_GET_GLOBAL, OP_SET_GLOBAL, OP_GET_LOCAL, OP_SET_LOCAL, OP_GET_CELL, OP_SET_CELL, OP_GET_FREE, OP_LOAD_FREE,
+    OP_ARRAY, OP_HASH, OP_INDEX, OP_CALL, OP_RETURN_VALUE, OP_CLOSURE, OP_PROTECT, OP_UNPROTECT,
+    OP_WRAP_RETURN, OP_UNWRAP_RETURN, OP_JUMP_IF_RETURN,
+)
+from .builtins_ import builtins
+
+MAX_FRAMES = 1 << 16
+
+NULL = evaluator.NULL
+TRUE = evaluator.TRUE
+FALSE = evaluator.FALSE
+
+# what a let's slot holds until the let runs: an Error, so the class check every read makes anyway catches it
+UNSET = object_.Error('unset')
+
+INFIX_OPERATORS = {OP_ADD: '+', OP_SUB: '-', OP_MUL: '*', OP_DIV: '/', OP_EQ: '==', OP_NOT_EQ: '!=', OP_GT: '>', OP_LT: '<'}
+
+
+class VMError(Exception):
+    def __init__(self, err: object_.Error): self.err = err
+
+
+class Frame:
+    __slots__ = ('cl', 'ip', 'locals_')
+
+    def __init__(self, cl: object_.Closure, locals_: list):
+        self.cl = cl
+        self.ip = 0
+        self.locals_ = locals_
+
+
+def is_truthy(obj: object_.Object) -> bool:
+    if obj is TRUE: return True
+    if obj is FALSE or isinstance(obj, object_.Null): return False
+    if isinstance(obj, (object_.Integer, object_.Boolean, object_.String)): return bool(obj.Value)
+    return True
+
+
+class VM:
+    def __init__(self, bytecode: Bytecode, globals_: list | None = None):
+        self.constants = bytecode.constants
+        self.global_names = bytecode.global_names
+        # globals_ may be shared across runs (REPL); unset slots hold None
+        self.globals_ = globals_ if globals_ is not None else []
+        if len(self.globals_) < len(self.global_names):
+            self.globals_.extend([None] * (len(self.global_names) - len(self.globals_)))
+        # builtins are globals nobody has set yet, so a later let of the same name replaces them everywhere
+        for i, name in enumerate(self.global_names):
+            if self.globals_[i] is None and name in builtins: self.globals_[i] = builtins[name]
+
+        main_fn = object_.CompiledFunction(bytecode.instructions, 0, 0, None)
+        self.main_frame = Frame(object_.Closure(main_fn, []), [])
+
+    def run(self) -> object_.Object:
+        self.stack: list[object_.Object] = []
+        self.frames: list[Frame] = []
+        self.handlers: list[tuple[Frame, int, int, int]] = []  # (frame, frame depth, stack height, target ip) per OP_PROTECT
+        frame, ip = self.main_frame, 0
+        while True:
+            try:
+                return self.execute(frame, ip)
+            except VMError as e:
+                if not self.handlers: return e.err
+                # unwind to the enclosing let and bind the error there
+                frame, depth, height, ip = self.handlers.pop()
+                del self.frames[depth:]
+                del self.stack[height:]
+                self.stack.append(e.err)
+
+    def execute(self, frame: Frame, ip: int) -> object_.Object:
+        constants = self.constants
+        globals_ = self.globals_
+        stack = self.stack
+        push = stack.append
+        pop = stack.pop
+        frames = self.frames
+        handlers = self.handlers
+
+        ins = frame.cl.fn.instructions
+        locals_ = frame.locals_
+        Integer = object_.Integer
+        Error = object_.Error
+
+        while True:
+            op = ins[ip]
+
+            if op == OP_GET_LOCAL:
+                val = locals_[ins[ip+1]]
+                if val.__class__ is Error:
+                    if val is UNSET: val = self.fallback(frame, ip)
+                    if val.__class__ is Error: raise VMError(val)
+                push(val)
+                ip += 2
+
+            elif op == OP_CONSTANT:
+                push(constants[ins[ip+1]])
+                ip += 2
+
+            elif op <= OP_LT and op >= OP_ADD:
+                right = pop()
+                left = pop()
+                if left.__class__ is Integer and right.__class__ is Integer and op != OP_DIV:
+                    l, r = left.Value, right.Value
+                    if op == OP_ADD: res = Integer(l + r)
+                    elif op == OP_SUB: res = Integer(l - r)
+                    elif op == OP_MUL: res = Integer(l * r)
+                    elif op == OP_EQ: res = TRUE if l == r else FALSE
+                    elif op == OP_NOT_EQ: res = TRUE if l != r else FALSE
+                    elif op == OP_GT: res = TRUE if l > r else FALSE
+                    else: res = TRUE if l < r else FALSE
+                else:
+                    res = evaluator.evaluate_infix_expression(INFIX_OPERATORS[op], left, right)
+                    if isinstance(res, Error): raise VMError(res)
+                push(res)
+                ip += 1
+
+            elif op == OP_JUMP_NOT_TRUTHY:
+                cond = pop()
+                if cond is TRUE or (cond is not FALSE and is_truthy(cond)): ip += 2
+                else: ip = ins[ip+1]
+
+            elif op == OP_JUMP:
+                ip = ins[ip+1]
+
+            elif op == OP_GET_GLOBAL:
+                val = globals_[ins[ip+1]]
+                if val is None: raise VMError(evaluator.new_error(f'identifier not found: {self.global_names[ins[ip+1]]}'))
+                if val.__class__ is Error: raise VMError(val)
+                push(val)
+                ip += 2
+
+            elif op == OP_GET_CELL:
+                val = locals_[ins[ip+1]][0]
+                if val.__class__ is Error:
+                    if val is UNSET: val = self.fallback(frame, ip)
+                    if val.__class__ is Error: raise VMError(val)
+                push(val)
+                ip += 2
+
+            elif op == OP_GET_FREE:
+                val = frame.cl.free[ins[ip+1]][0]
+                if val.__class__ is Error:
+                    if val is UNSET: val = self.fallback(frame, ip)
+                    if val.__class__ is Error: raise VMError(val)
+                push(val)
+                ip += 2
+
+            elif op == OP_CALL:
+                nargs = ins[ip+1]
+                callee = stack[-1-nargs]
+                if callee.__class__ is object_.Closure:
+                    fn = callee.fn
+                    if nargs != fn.num_params:
+                        raise VMError(evaluator.new_error(f'len of args dont match len of parameters: {nargs} != {fn.num_params}'))
+                    if len(frames) >= MAX_FRAMES: raise VMError(evaluator.new_error('stack overflow'))
+                    new_locals = stack[len(stack)-nargs:]
+                    if fn.num_locals > nargs: new_locals.extend([UNSET] * (fn.num_locals - nargs))
+                    for i in fn.cells: new_locals[i] = [new_locals[i]]
+                    del stack[len(stack)-nargs-1:]
+
+                    frame.ip = ip + 2
+                    frames.append(frame)
+                    frame = Frame(callee, new_locals)
+                    ins = fn.instructions
+                    ip = 0
+                    locals_ = new_locals
+
+                elif callee.__class__ is object_.BuiltIn:
+                    args = stack[len(stack)-nargs:]
+                    del stack[len(stack)-nargs-1:]
+                    res = callee.func(args)
+                    if isinstance(res, Error): raise VMError(res)
+                    push(res)
+                    ip += 2
+
+                else:
+                    raise VMError(evaluator.new_error(f'not a function: {callee.Type()}'))
+
+            elif op == OP_RETURN_VALUE:
+                if not frames: return pop()
+                # a return from inside a let's value abandons that let's handler
+                while handlers and handlers[-1][1] == len(frames): handlers.pop()
+                frame = frames.pop()
+                ins = frame.cl.fn.instructions
+                ip = frame.ip
+                locals_ = frame.locals_
+
+            elif op == OP_POP:
+                pop()
+                ip += 1
+
+            elif op == OP_TRUE:
+                push(TRUE)
+                ip += 1
+
+            elif op == OP_FALSE:
+                push(FALSE)
+                ip += 1
+
+            elif op == OP_NULL:
+                push(NULL)
+                ip += 1
+
+            elif op == OP_SET_LOCAL:
+                locals_[ins[ip+1]] = pop()
+                ip += 2
+
+            elif op == OP_SET_GLOBAL:
+                globals_[ins[ip+1]] = pop()
+                ip += 2
+
+            elif op == OP_SET_CELL:
+                locals_[ins[ip+1]][0] = pop()
+                ip += 2
+
+            elif op == OP_JUMP_IF_RETURN:
+                if stack[-1].__class__ is object_.ReturnValue: ip = ins[ip+1]
+                else: ip += 2
+
+            elif op == OP_PROTECT:
+                handlers.append((frame, len(frames), len(stack), ins[ip+1]))
+                ip += 2
+
+            elif op == OP_UNPROTECT:
+                handlers.pop()
+                ip += 1
+
+            elif op == OP_LOAD_FREE:
+                push(frame.cl.free[ins[ip+1]])
+                ip += 2
+
+            elif op == OP_WRAP_RETURN:
+                stack[-1] = object_.ReturnValue(stack[-1])
+                ip += 1
+
+            elif op == OP_UNWRAP_RETURN:
+                stack[-1] = stack[-1].Value
+                ip += 1
+
+            elif op == OP_CLOSURE:
+                fn = constants[ins[ip+1]]
+                nfree = ins[ip+2]
+                if nfree:
+                    free = stack[len(stack)-nfree:]
+                    del stack[len(stack)-nfree:]
+                else: free = []
+                push(object_.Closure(fn, free))
+                ip += 3
+
+            elif op == OP_MINUS or op == OP_BANG:
+                right = pop()
+                if op == OP_MINUS and right.__class__ is Integer: res = Integer(-right.Value)
+                else:
+                    res = evaluator.evaluate_prefix_expression('-' if op == OP_MINUS else '!', right)
+                    if isinstance(res, Error): raise VMError(res)
+                push(res)
+                ip += 1
+
+            elif op == OP_INDEX:
+                right = pop()
+                left = pop()
+                if left.Type() not in (object_.ARRAY_OBJ, object_.HASH_OBJ):
+                    raise VMError(evaluator.new_error(f'left is not array or hash, got {left.Type()}'))
+                res = evaluator.evaluate_index(left, right)
+                if isinstance(res, Error): raise VMError(res)
+                push(res)
+                ip += 1
+
+            elif op == OP_ARRAY:
+                n = ins[ip+1]
+                elements = stack[len(stack)-n:] if n else []
+                if n: del stack[len(stack)-n:]
+                push(object_.new_array(elements))
+                ip += 2
+
+            elif op == OP_HASH:
+                n = ins[ip+1]
+                items = stack[len(stack)-2*n:] if n else []
+                if n: del stack[len(stack)-2*n:]
+                pairs = {}
+                for i in range(0, len(items), 2):
+                    key = items[i]
+                    if key.Type() not in (object_.STRING_OBJ, object_.BOOLEAN_OBJ, object_.INTEGER_OBJ):
+                        raise VMError(evaluator.new_error(f'key type should be one of STRING, BOOLEAN or INTEGER. got={key.Type()}'))
+                    pairs[key.HashKey()] = (key, items[i+1])
+                push(object_.Hash(pairs))
+                ip += 2
+
+            else:
+                raise ValueError(f'unknown opcode {op} at {ip}')
+
+
+    def fallback(self, frame: Frame, ip: int) -> object_.Object:
+        # the slot read at ip is still unset: try the enclosing functions' bindings, then the global
+        name, candidates = frame.cl.fn.fallbacks[ip]
+        for scope, index in candidates:
+            if scope == LOCAL_SCOPE: val = frame.locals_[index]
+            elif scope == CELL_SCOPE: val = frame.locals_[index][0]
+            elif scope == FREE_SCOPE: val = frame.cl.free[index][0]
+            else: val = self.globals_[index]
+            if val is not None and val is not UNSET: return val
+        return evaluator.new_error(f'identifier not found: {name}')
+
+
+def run(bytecode: Bytecode, globals_: list | None = None) -> object_.Object:
+    return VM(bytecode, globals_=globals_).run()